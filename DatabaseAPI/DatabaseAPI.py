@@ -1,14 +1,27 @@
 from abc import ABC, abstractmethod
-import pymongo
+import hashlib
+import json
+import logging
+import os
+import threading
+import numpy as np
 
 class DatabaseAPI:
     @staticmethod
     def get_database(database="Mongo", *args, **kwargs):
-        databases = {"Mongo": Mongo}
+        databases = {"Mongo": Mongo, "Null": Null, "Columnar": Columnar}
         if database in databases:
             return databases[database](*args, **kwargs)
         return False
 
+def observation_hash(observation):
+    """
+    :param observation:
+    :return: Hash of the content of an observation, used to find duplicates
+    """
+    content = json.dumps(observation, sort_keys=True, default=str).encode()
+    return hashlib.sha1(content).hexdigest()
+
 class DatabaseInterface(ABC):
     @abstractmethod
     def store_observation(self, observation):
@@ -18,39 +31,327 @@ class DatabaseInterface(ABC):
     def _get_game_id(self, collection):
         pass
 
+    def flush(self):
+        """
+        Writes out observations that are still buffered
+        """
+        pass
+
+    def close(self):
+        pass
+
+class Null(DatabaseInterface):
+    """
+    Database that stores nothing. Used when observations are not persisted, e.g. during training
+    """
+    def store_observation(self, observation, collection="Observations", duplicate=False):
+        return False
+
+    def _get_game_id(self, collection):
+        return False
+
 class Mongo(DatabaseInterface):
-    def __init__(self, connection_string="mongodb://localhost:27017/", database="BNO"):
-        self.client = pymongo.MongoClient(connection_string)
+    """
+    Observations are buffered in memory and written in bulk by a background thread,
+    so storing an observation never waits for the database.
+    Duplicates are found by a hash of the observation, both in memory and through a unique index on the hash.
+    pymongo is imported on first use, so importing this module does not load it.
+    """
+    _clients = {}  # {connection_string: MongoClient}, shared by all instances in the process
+    _clients_lock = threading.Lock()
+
+    def __init__(self, connection_string="mongodb://localhost:27017/", database="BNO", client=None,
+                 buffer_size=1000, flush_interval=5):
+        """
+        :param connection_string:
+        :param database:
+        :param client: Already connected client, e.g. mongomock.MongoClient().
+        If not given, the process wide client for connection_string is used
+        :param buffer_size: Number of buffered observations that triggers a write
+        :param flush_interval: Maximum number of seconds an observation stays buffered
+        """
+        self.client = client if client is not None else self.get_client(connection_string)
         self.db = self.client[database]
 
         self.game_id = False # Stores the game ID which is an INT in ascending order
 
-    def store_observation(self, observation, collection="Observations", duplicate=False):
-        collection = self.db[collection]
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._buffer = {}  # {collection: [observations]}
+        self._buffered = 0
+        self._hashes = set()  # Hashes of observations stored by this instance
+        self._indexed = set()  # Collections with a unique index on the observation hash
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = threading.Event()
+        self._writer = None
 
-        observation["game_id"] = self._get_game_id(collection)  # Find game id and add to observation
+    def store_observation(self, observation, collection="Observations", duplicate=False):
+        """
+        Queues an observation to be written to the database
+        :param observation:
+        :param collection:
+        :param duplicate: Whether to store the observation even if the same one was stored already
+        :return: True if the observation was queued, False if it is a duplicate
+        """
+        observation["game_id"] = self._get_game_id(self.db[collection])  # Find game id and add to observation
 
         # Checking if record is duplicate (else each action would be stored, meaning the result would have days * 10 records
         if not duplicate:
-            dupe = collection.find_one(observation)
-
-            if dupe:
+            obs_hash = observation_hash(observation)
+            if obs_hash in self._hashes:
                 return False
+            self._hashes.add(obs_hash)
+            observation["obs_hash"] = obs_hash
+
+        with self._lock:
+            self._buffer.setdefault(collection, []).append(observation)
+            self._buffered += 1
+            buffered = self._buffered
+
+        if self._writer is None:
+            self._closed.clear()
+            self._writer = threading.Thread(target=self._write_behind, daemon=True)
+            self._writer.start()
+        if buffered >= self.buffer_size:
+            self._wake.set()
+        return True
+
+    def flush(self):
+        """
+        Writes all buffered observations to the database
+        :return: Number of observations written
+        """
+        import pymongo.errors
+
+        with self._flush_lock:
+            with self._lock:
+                buffer, self._buffer = self._buffer, {}
+                self._buffered = 0
+
+            written = 0
+            for name, observations in buffer.items():
+                collection = self.db[name]
+                if name not in self._indexed:
+                    # Sparse, so observations stored with duplicate=True (no hash) are not affected
+                    collection.create_index("obs_hash", unique=True, sparse=True)
+                    self._indexed.add(name)
+                try:
+                    written += len(collection.insert_many(observations, ordered=False).inserted_ids)
+                except pymongo.errors.BulkWriteError as e:
+                    # Duplicates already in the database are skipped, anything else is an actual error
+                    errors = [error for error in e.details['writeErrors'] if error['code'] != 11000]
+                    if errors:
+                        logging.error("Failed to store " + str(len(errors)) + " observations: " + str(errors[0]))
+                    written += e.details['nInserted']
+            return written
+
+    def close(self):
+        """
+        Stops the background writer and writes out everything still buffered
+        :return:
+        """
+        self._closed.set()
+        self._wake.set()
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
+        self.flush()
+
+    @classmethod
+    def get_client(cls, connection_string):
+        """
+        MongoClient keeps its own connection pool and is thread safe, so one client per server is shared
+        :param connection_string:
+        :return: MongoClient
+        """
+        import pymongo
 
-        insert = collection.insert_one(observation)
-        return insert.inserted_id
+        with cls._clients_lock:
+            if connection_string not in cls._clients:
+                cls._clients[connection_string] = pymongo.MongoClient(connection_string)
+            return cls._clients[connection_string]
+
+    def _write_behind(self):
+        import pymongo.errors
+
+        while not self._closed.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except pymongo.errors.PyMongoError as e:
+                logging.error("Failed to store observations: " + str(e))
 
     def _get_game_id(self, collection):
         """
-        Getting game id
+        Getting game id. Ids are claimed from a counter in the Counters collection, so games writing at the same
+        time never get the same id, even while their observations are still buffered
         :param collection:
         :return:
         """
         if not self.game_id:
-            game_id = collection.find_one({}, sort=[('game_id', pymongo.DESCENDING)], projection={'game_id': True})
-            if game_id:
-                self.game_id = game_id['game_id'] + 1
+            import pymongo
+            import pymongo.errors
+
+            counters = self.db["Counters"]
+            if counters.find_one({"_id": collection.name}) is None:
+                # The counter starts at the highest id already stored, for collections written before it existed
+                game_id = collection.find_one({}, sort=[('game_id', pymongo.DESCENDING)], projection={'game_id': True})
+                try:
+                    counters.update_one({"_id": collection.name},
+                                        {"$setOnInsert": {"value": game_id['game_id'] if game_id else 0}}, upsert=True)
+                except pymongo.errors.DuplicateKeyError:
+                    pass  # Another game created the counter first
+
+            counter = counters.find_one_and_update({"_id": collection.name}, {"$inc": {"value": 1}}, upsert=True,
+                                                   return_document=pymongo.ReturnDocument.AFTER)
+            self.game_id = counter["value"]
+
+        return self.game_id
+
+class Columnar(DatabaseInterface):
+    """
+    Stores observations in local column files, no database server needed.
+
+    Every game gets a directory <path>/<collection>/game_<game_id> with one file per observation field.
+    Rows are appended as fixed width binary records, so each column can be read back as a memory-mapped
+    NumPy array of shape (rows, width) without copying. Column types and widths are in schema.json.
+    """
+    def __init__(self, path="observations", buffer_size=1000):
+        """
+        :param path: Directory the observations are stored in
+        :param buffer_size: Number of buffered observations that triggers a write
+        """
+        self.path = path
+        self.buffer_size = buffer_size
+
+        self.game_id = False # Stores the game ID which is an INT in ascending order
+        self._buffer = {}  # {collection: [observations]}
+        self._buffered = 0
+        self._hashes = set()  # Hashes of observations stored by this instance
+        self._schemas = {}  # {game directory: {field: [dtype, width]}}
+
+    def store_observation(self, observation, collection="Observations", duplicate=False):
+        """
+        Queues an observation to be written to disk
+        :param observation:
+        :param collection:
+        :param duplicate: Whether to store the observation even if the same one was stored already
+        :return: True if the observation was queued, False if it is a duplicate
+        """
+        observation["game_id"] = self._get_game_id(collection)
+
+        if not duplicate:
+            obs_hash = observation_hash(observation)
+            if obs_hash in self._hashes:
+                return False
+            self._hashes.add(obs_hash)
+
+        self._buffer.setdefault(collection, []).append(observation)
+        self._buffered += 1
+        if self._buffered >= self.buffer_size:
+            self.flush()
+        return True
+
+    def flush(self):
+        """
+        Appends all buffered observations to their column files
+        :return: Number of observations written
+        """
+        buffer, self._buffer = self._buffer, {}
+        self._buffered = 0
+
+        written = 0
+        for collection, observations in buffer.items():
+            games = {}
+            for observation in observations:
+                games.setdefault(observation["game_id"], []).append(observation)
+
+            for game_id, rows in games.items():
+                directory = self._game_directory(collection, game_id)
+                schema = self._get_schema(directory, rows[0])
+                for field, (dtype, width) in schema.items():
+                    column = np.array([row[field] for row in rows], dtype=dtype).reshape(len(rows), width)
+                    with open(os.path.join(directory, field + ".bin"), "ab") as f:
+                        f.write(column.tobytes())
+                written += len(rows)
+        return written
+
+    def close(self):
+        self.flush()
+
+    def games(self, collection="Observations"):
+        """
+        :param collection:
+        :return: IDs of the games stored in a collection
+        """
+        directory = os.path.join(self.path, collection)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(int(name[len("game_"):]) for name in os.listdir(directory) if name.startswith("game_"))
+
+    def load(self, game_id, collection="Observations"):
+        """
+        :param game_id:
+        :param collection:
+        :return: {field: memory-mapped array of shape (rows, width)} of a stored game
+        """
+        directory = self._game_directory(collection, game_id)
+        with open(os.path.join(directory, "schema.json")) as f:
+            schema = json.load(f)
+
+        columns = {}
+        for field, (dtype, width) in schema.items():
+            file = os.path.join(directory, field + ".bin")
+            if os.path.getsize(file) == 0:
+                columns[field] = np.zeros((0, width), dtype=dtype)
+            else:
+                columns[field] = np.memmap(file, dtype=dtype, mode="r").reshape(-1, width)
+        return columns
+
+    def _get_schema(self, directory, observation):
+        if directory not in self._schemas:
+            schema_file = os.path.join(directory, "schema.json")
+            if os.path.exists(schema_file):
+                with open(schema_file) as f:
+                    schema = json.load(f)
             else:
-                self.game_id = 1
+                # Types and widths are taken from the first observation of the game
+                schema = {}
+                for field, value in observation.items():
+                    array = np.array(value)
+                    if array.dtype.kind in "US":
+                        dtype = "S64"
+                    elif array.dtype.kind == "f":
+                        dtype = "float64"
+                    else:
+                        dtype = "int64"
+                    schema[field] = [dtype, int(array.size)]
+
+                with open(schema_file, "w") as f:
+                    json.dump(schema, f)
+            self._schemas[directory] = schema
+        return self._schemas[directory]
+
+    def _game_directory(self, collection, game_id):
+        return os.path.join(self.path, collection, "game_" + str(game_id))
+
+    def _get_game_id(self, collection):
+        """
+        Getting game id. The game directory is created here, so two stores never get the same game
+        :param collection:
+        :return:
+        """
+        if not self.game_id:
+            game_id = max(self.games(collection), default=0) + 1
+            while True:
+                try:
+                    os.makedirs(self._game_directory(collection, game_id))
+                    break
+                except FileExistsError:
+                    game_id += 1
+            self.game_id = game_id
 
-        return self.game_id
\ No newline at end of file
+        return self.game_id
@@ -0,0 +1,68 @@
+"""
+Runs the benchmarks and writes the results as JSON.
+
+    python -m benchmarks --players 10 --output results.json
+    python -m benchmarks --compare results.json   # exits with 1 if anything got slower than --tolerance
+    python -m benchmarks --import-budget 0.3      # exits with 1 if importing the packages is too slow
+    python -m benchmarks --import-budget 0.3 --imports-only   # only checks the imports
+"""
+import argparse
+import json
+import platform
+import sys
+import numpy as np
+from benchmarks.bench import BENCHMARKS, ENGINES, run, compare
+from benchmarks.imports import check_imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of the engine, API and env hot paths")
+    parser.add_argument("--players", type=int, default=10, help="Number of players in every game, except env_step which always plays with 10")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-time", type=float, default=1.0, help="Minimum number of seconds per benchmark")
+    parser.add_argument("--benchmark", action="append", choices=list(BENCHMARKS), help="Benchmark to run, repeatable")
+    parser.add_argument("--engine", action="append", choices=list(ENGINES), help="Engine to run on, repeatable")
+    parser.add_argument("--output", help="File the JSON results are written to, printed if not given")
+    parser.add_argument("--compare", help="JSON results of a previous run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed slowdown when comparing, 0.1 = 10 %%")
+    parser.add_argument("--import-budget", type=float,
+                        help="Seconds importing bno_system and gym_foodgame.envs in a new process may take")
+    parser.add_argument("--imports-only", action="store_true", help="Only check the imports, run no benchmarks")
+    args = parser.parse_args()
+    if args.imports_only and args.import_budget is None:
+        parser.error("--imports-only needs --import-budget")
+
+    report = {
+        "meta": {"players": args.players, "seed": args.seed, "min_time": args.min_time,
+                 "python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine()},
+    }
+    violations = {}
+    # Imports are checked first, they take a fraction of the time of the benchmarks
+    if args.import_budget is not None:
+        report["imports"], violations = check_imports(args.import_budget)
+    results = {} if args.imports_only else run(args.benchmark, args.engine, args.players, args.seed, args.min_time)
+    report["results"] = results
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    failed = False
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for name, ratio in regressions.items():
+            print("Regression:", name, "runs at", str(round(ratio * 100, 1)) + "% of the baseline", file=sys.stderr)
+        failed = bool(regressions)
+
+    for module, reason in violations.items():
+        print("Import budget:", module, reason, file=sys.stderr)
+    if failed or violations:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+import copy
+import time
+import numpy as np
+from bno_system import GameAPI, GameSystem, ArrayGameSystem
+
+ENGINES = {"GameSystem": GameSystem, "ArrayGameSystem": ArrayGameSystem}
+
+
+class ConstantModel:
+    """
+    Stands in for an opponent policy, so compete_mode is measured without the cost of a real model
+    """
+    def __init__(self, action=5000):
+        self.action = action
+
+    def predict(self, x):
+        return np.full((len(x), 1), self.action, dtype=np.float32)
+
+
+def measure(function, min_time=1.0, min_iterations=10):
+    """
+    Calls function until min_time seconds and min_iterations calls have passed
+    :param function: Called without arguments, returns the number of operations it did
+    :param min_time:
+    :param min_iterations:
+    :return: {"ops_per_sec": ..., "operations": ..., "seconds": ...}
+    """
+    operations = 0
+    iterations = 0
+    start = time.perf_counter()
+    elapsed = 0
+    while elapsed < min_time or iterations < min_iterations:
+        operations += function()
+        iterations += 1
+        elapsed = time.perf_counter() - start
+    return {"ops_per_sec": operations / elapsed, "operations": operations, "seconds": elapsed}
+
+
+def new_game(engine, players, seed):
+    game = ENGINES[engine](seed=seed)
+    api = GameAPI.BotAPI(game, database="Null")
+    uids = [game.add_player() for x in range(players)]
+    return game, api, uids
+
+
+def bench_do_turn(engine, players, seed, min_time, large_lobby=False):
+    game, api, uids = new_game(engine, players, seed)
+    game.large_lobby = large_lobby
+    actions = {uid: [{"name": "do_nothing", "params": [0]}] * 3 for uid in uids}
+
+    def turn():
+        for uid in uids:
+            game.players[uid].end_turn()
+        game.do_turn(actions)
+        return 1
+    return measure(turn, min_time)
+
+
+def bench_observation(engine, players, seed, min_time, ver):
+    game, api, uids = new_game(engine, players, seed)
+    # Playing a few random turns so the game is not in its initial state
+    for x in range(30):
+        GameAPI.random_mode(uids, api)
+
+    def observe():
+        for uid in uids:
+            api.observation(uid, ver=ver)
+        return len(uids)
+    return measure(observe, min_time)
+
+
+def bench_int_to_actions(engine, players, seed, min_time):
+    game, api, uids = new_game(engine, players, seed)
+    actions = np.random.default_rng(seed).integers(0, api.action_boundary, size=1000).tolist()
+
+    def decode():
+        for action in actions:
+            api._int_to_actions(action)
+        return len(actions)
+    return measure(decode, min_time)
+
+
+def bench_decode_actions(engine, players, seed, min_time):
+    game, api, uids = new_game(engine, players, seed)
+    actions = np.random.default_rng(seed).integers(0, api.action_boundary, size=100000)
+
+    def decode():
+        api.decode_actions(actions)
+        return len(actions)
+    return measure(decode, min_time)
+
+
+def bench_market_auctions(engine, players, seed, min_time, listings=2000, bids=10000):
+    game, api, uids = new_game(engine, players, seed)
+    game.market_limit = None
+    game.global_max_bid = 20
+    rng = np.random.default_rng(seed)
+    for uid in uids:
+        game.players[uid].food = 100
+        game.players[uid].coins = 100
+    for i in range(listings):
+        game.players[uids[i % len(uids)]].add_to_market(1, int(rng.integers(1, 20)))
+    mids = list(game.food_market)
+    orders = [(uids[int(bidder)], mids[int(listing)], int(bid), int(priority))
+              for bidder, listing, bid, priority in zip(rng.integers(0, len(uids), bids), rng.integers(0, len(mids), bids),
+                                                        rng.integers(0, 40, bids), rng.integers(0, 3, bids))]
+
+    def settle():
+        # Listings that were sold are put back, so every settlement sees the same market
+        for mid in mids:
+            game.food_market[mid] = {"amount": 1, "start_bid": 10, "uid": uids[0]}
+        for uid, mid, bid, priority in orders:
+            game.food_bids.add(mid, uid, bid, priority)
+        game._do_market_auctions()
+        return len(orders)
+    return measure(settle, min_time)
+
+
+def bench_fork(engine, players, seed, min_time, deepcopy=False):
+    game, api, uids = new_game(engine, players, seed)
+    for x in range(30):
+        GameAPI.random_mode(uids, api)
+    fork = copy.deepcopy if deepcopy else type(game).fork
+
+    def branch():
+        fork(game)
+        return 1
+    return measure(branch, min_time)
+
+
+def bench_compete_mode(engine, players, seed, min_time):
+    game, api, uids = new_game(engine, players, seed)
+    game_api = GameAPI()
+    model = ConstantModel()
+
+    def step():
+        game_api.compete_mode(model, uids, api)
+        return 1
+    return measure(step, min_time)
+
+
+def bench_env_step(engine, players, seed, min_time):
+    # gym is only needed for this benchmark. The env always plays with 10 players, players is not used
+    from gym_foodgame.envs import FoodGameEnv
+
+    env = FoodGameEnv()
+    env.game_system = ENGINES[engine]
+    env.database = "Null"
+    env.enemy_model = ConstantModel()
+    env.seed(seed)
+    env.reset()
+    actions = np.random.default_rng(seed).integers(0, env.action_boundary, size=1000).tolist()
+
+    def step():
+        for action in actions[:100]:
+            obs, reward, done, info = env.step(action)
+            if done:
+                env.reset()
+        return 100
+    result = measure(step, min_time)
+    result["players"] = len(env.players)
+    return result
+
+
+def bench_vec_env_step(engine, players, seed, min_time, num_envs=16):
+    # gym is only needed for this benchmark. The envs always play with 10 players, players is not used
+    from gym_foodgame.envs import FoodGameVecEnv
+
+    vec_env = FoodGameVecEnv(num_envs)
+    for env in vec_env.envs:
+        env.game_system = ENGINES[engine]
+        env.database = "Null"
+    vec_env.enemy_model = ConstantModel()
+    vec_env.seed(seed)
+    vec_env.reset()
+    actions = np.random.default_rng(seed).integers(0, vec_env.envs[0].action_boundary, size=(10, num_envs))
+
+    def step():
+        for step_actions in actions:
+            vec_env.step(step_actions)
+        return len(actions) * num_envs
+    result = measure(step, min_time)
+    result["players"] = len(vec_env.envs[0].players)
+    return result
+
+
+BENCHMARKS = {
+    "do_turn": bench_do_turn,
+    "do_turn_large_lobby": lambda *args: bench_do_turn(*args, large_lobby=True),
+    "observation_v1": lambda *args: bench_observation(*args, ver=1),
+    "observation_v2": lambda *args: bench_observation(*args, ver=2),
+    "observation_v3": lambda *args: bench_observation(*args, ver=3),
+    "int_to_actions": bench_int_to_actions,
+    "decode_actions": bench_decode_actions,
+    "market_auctions": bench_market_auctions,
+    "fork": bench_fork,
+    "deepcopy": lambda *args: bench_fork(*args, deepcopy=True),
+    "compete_mode": bench_compete_mode,
+    "env_step": bench_env_step,
+    "vec_env_step": bench_vec_env_step,
+}
+
+
+def run(benchmarks=None, engines=None, players=10, seed=0, min_time=1.0):
+    """
+    :param benchmarks: Names of the benchmarks to run, all if not given
+    :param engines: Names of the engines to run them on, all if not given
+    :param players: Number of players in every game
+    :param seed: Seed of every game
+    :param min_time: Minimum number of seconds each benchmark runs for
+    :return: {"<benchmark>[<engine>]": result of measure and the number of "players" it ran with}
+    """
+    results = {}
+    for name in benchmarks or BENCHMARKS:
+        for engine in engines or ENGINES:
+            result = BENCHMARKS[name](engine, players, seed, min_time)
+            result.setdefault("players", players)
+            results[name + "[" + engine + "]"] = result
+    return results
+
+
+def compare(results, baseline, tolerance=0.1):
+    """
+    :param results: Results of this run
+    :param baseline: Results of a previous run
+    :param tolerance: Allowed slowdown, 0.1 = 10 %
+    :return: {benchmark: ratio} of benchmarks that got slower than the tolerance allows
+    """
+    regressions = {}
+    for name, result in results.items():
+        if name in baseline:
+            ratio = result["ops_per_sec"] / baseline[name]["ops_per_sec"]
+            if ratio < 1 - tolerance:
+                regressions[name] = ratio
+    return regressions
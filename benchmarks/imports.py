@@ -0,0 +1,49 @@
+import json
+import os
+import subprocess
+import sys
+
+# Only the standard library is imported here, so the tests can check the import budget without the benchmarks.
+# Modules worker processes import on startup, and optional backends importing them must not load
+IMPORT_MODULES = ["bno_system", "gym_foodgame.envs"]
+OPTIONAL_MODULES = ["pymongo", "pyarrow", "scipy", "tensorflow", "h5py"]
+
+
+def measure_import(module, repeat=5):
+    """
+    Imports a module in fresh interpreters, the way a new worker process does
+    :param module:
+    :param repeat: Number of interpreters started, the fastest import is reported
+    :return: {"seconds": ..., "optional_modules": OPTIONAL_MODULES loaded by the import}
+    """
+    code = ("import sys, time, json\n"
+            "start = time.perf_counter()\n"
+            "import " + module + "\n"
+            "print(json.dumps([time.perf_counter() - start, [m for m in " + repr(OPTIONAL_MODULES) +
+            " if m in sys.modules]]))")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    seconds = None
+    for x in range(repeat):
+        output = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+        elapsed, optional_modules = json.loads(output.stdout.splitlines()[-1])
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+    return {"seconds": seconds, "optional_modules": optional_modules}
+
+
+def check_imports(budget, modules=None):
+    """
+    :param budget: Maximum number of seconds an import may take
+    :param modules: Modules to import, IMPORT_MODULES if not given
+    :return: Import results {module: measure_import}, {module: reason} of modules over the budget
+    or loading optional modules
+    """
+    imports = {}
+    violations = {}
+    for module in modules or IMPORT_MODULES:
+        imports[module] = result = measure_import(module)
+        if result["seconds"] > budget:
+            violations[module] = "takes " + str(round(result["seconds"], 3)) + "s, the budget is " + str(budget) + "s"
+        elif result["optional_modules"]:
+            violations[module] = "loads " + ", ".join(result["optional_modules"])
+    return imports, violations
@@ -1,2 +1,4 @@
 from .game_system import Player, GameSystem
+from .array_engine import ArrayGameSystem
+from .numpy_model import NumpyModel
 from .api import GameAPI
\ No newline at end of file
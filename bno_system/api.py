@@ -1,48 +1,67 @@
 from bno_system import Player, GameSystem
-from random import randint
 import math
+from bisect import bisect_left
 import numpy as np
 from DatabaseAPI import DatabaseAPI
-from collections import deque
+from bno_system.observation import ObservationEncoder
+from bno_system.observation_memory import ObservationMemory
 
 
 class GameAPI:
-    observation_memory = {}  # Observation memory
+    def __init__(self, window_size=40):
+        # Observation windows of the players in compete mode, one memory per game
+        self.observation_memory = ObservationMemory(window_size)
+
     @staticmethod
     def random_mode(players, player_api):
         score = []
-        for player in players:
-            params = [randint(0, 7), randint(0, 9), randint(0, 9), randint(0, 9)]
-
+        # Actions of all players are drawn at once from the random number generator of the api
+        all_params = player_api.rng.integers(0, [7, 9, 9, 9], size=(len(players), 4), endpoint=True).tolist()
+        for player, params in zip(players, all_params):
             observation = player_api.do_action(player, params)
-            if observation:
+            if observation is not None:
                 score.append(observation[-1])
         return score
 
     def compete_mode(self, model, players, player_api):
-        score = []
-        for uid in players:
-            # Initialising observation memory
-            if uid not in self.observation_memory:
-                self.observation_memory[uid] = deque([[0] * 253] * 40)
-            observation = player_api.observation(uid)
-
-            self.observation_memory[uid].append(observation)
-            self.observation_memory[uid].popleft()
+        if not players:
+            return []
 
-            # I have no idea why this works. Please explain! I'm sure it's wrong..
-            observation = [[self.observation_memory[uid]]]
+        # All windows are taken as one batch (n_players, 40, 253) so the model is only run once
+        actions = model.predict(self.compete_windows(players, player_api))
+        return self.compete_actions(actions, players, player_api)
 
-            action = model.predict(observation)
+    def compete_windows(self, players, player_api):
+        """
+        First half of compete_mode, adds the current observation of every player to their window
+        :param players:
+        :param player_api:
+        :return: Windows of the players (n_players, window_size, observation size), the input of the model.
+        May be a view into the observation memory, it is valid until the next observation is added
+        """
+        for uid in players:
+            observation = player_api.observation(uid)
+            self.observation_memory.append(uid, observation)
+        return self.observation_memory.windows(players)
 
+    def compete_actions(self, actions, players, player_api):
+        """
+        Second half of compete_mode, lets every player take the action predicted for their window
+        :param actions: Output of the model for the windows of compete_windows, shape (n_players, 1)
+        :param players:
+        :param player_api:
+        :return: Scores of the players
+        """
+        score = []
+        for uid, action in zip(players, actions):
             # Convert from numpy array to numpy int to python native int
-            action = action[0][0].astype(int).item()
+            action = action[0].astype(int).item()
             # Taking the absolute value of an action
             action = abs(action)
 
-            observation = player_api.do_action(uid, action)
-            if observation:
-                score.append(observation[-1])
+            # The score is read directly, an observation of the player is only built for the next window
+            player_api.do_action(uid, action, ver=None)
+            score.append(np.float32(player_api.game.players[uid].score))
         return score
 
     @staticmethod
@@ -56,7 +75,7 @@ class GameAPI:
         score = []
         for player in players:
             observation = player_api.do_action(player, 0)
-            if observation:
+            if observation is not None:
                 score.append(observation[-1])
         return score
 
@@ -68,7 +87,16 @@ class GameAPI:
 
         player = None
 
-        def __init__(self):
+        def __init__(self, game=None, database="Mongo"):
+            """
+            :param game: GameSystem the bots are playing in. A new game is created if none is given
+            :param database: Database observations are saved to, see DatabaseAPI.get_database
+            """
+            self.game = game if game is not None else GameSystem()
+            # Random numbers of the bots, spawned from the seed of the game. Kept apart from the random number
+            # generator of the game, so the game only depends on its seed and the actions taken in it
+            self.rng = np.random.default_rng(self.game.seed_sequence.spawn(1)[0])
+
             # Used to transform action parameters to something more useful
             # Note that it only changes variables at first position - [1] in the action list
             # List length is how many variables it accepts, numbers within the list is max range
@@ -84,16 +112,24 @@ class GameAPI:
                             'add_bid_for_food': [100, 100, 100]
                             }
 
+            # Action names in order of their IDs, number of integer actions taken by each action
+            # and the cumulative upper boundary of every action in the integer action space
+            self.action_names = list(self.actions)
+            self.action_sizes = [int(np.prod(self.actions[name])) for name in self.action_names]
+            self.action_bounds = [int(bound) for bound in np.cumsum(self.action_sizes)]
+            self._action_sizes_array = np.array(self.action_sizes, dtype=np.int64)
+            self._action_bounds_array = np.array(self.action_bounds, dtype=np.int64)
+
             # Getting indexes of actions and mapping them to helper functions
-            add_vote_for_turn = list(self.actions).index('add_vote_for_turn')
-            add_bid_for_food = list(self.actions).index('add_bid_for_food')
-            add_vote_for_skill_auction = list(self.actions).index('add_vote_for_skill_auction')
-            add_food_vote = list(self.actions).index('add_food_vote')
+            add_vote_for_turn = self.action_names.index('add_vote_for_turn')
+            add_bid_for_food = self.action_names.index('add_bid_for_food')
+            add_vote_for_skill_auction = self.action_names.index('add_vote_for_skill_auction')
+            add_food_vote = self.action_names.index('add_food_vote')
 
-            energy_to_coins = list(self.actions).index('energy_to_coins')
-            energy_to_food = list(self.actions).index('energy_to_food')
-            add_to_market = list(self.actions).index('add_to_market')
-            add_bid_for_skill_auction = list(self.actions).index('add_bid_for_skill_auction')
+            energy_to_coins = self.action_names.index('energy_to_coins')
+            energy_to_food = self.action_names.index('energy_to_food')
+            add_to_market = self.action_names.index('add_to_market')
+            add_bid_for_skill_auction = self.action_names.index('add_bid_for_skill_auction')
 
             self.helpers = [{
                                 add_vote_for_turn: self._param_to_uid,
@@ -112,126 +148,121 @@ class GameAPI:
                              }
                             ]
 
-            # Holds information on whether a bot is ready to end turn (len < 3) or ready to finish turn
-            self.bot_actions = {}
             # Boundary for integer action
             self.action_boundary = self._get_boundaries()
 
-            self.db = DatabaseAPI.get_database("Mongo")
+            # Writes observations into float32 arrays
+            self.encoder = ObservationEncoder(self.game)
+
+            # Connected on first use, so games that never save observations never touch the database
+            self.database = database
+            self._db = None
+
+            # GameRecorder the actions are recorded by, see bno_system.recorder
+            self.recorder = None
+
+        @property
+        def bot_actions(self):
+            # Holds information on whether a bot is ready to end turn (len < 3) or ready to finish turn.
+            # Kept in the game, so snapshots and forks taken in the middle of a turn keep the queued actions
+            return self.game.pending_actions
 
-        def observation(self, uid, save_to_db=False, ver=2):
+        @bot_actions.setter
+        def bot_actions(self, bot_actions):
+            self.game.pending_actions = bot_actions
+
+        @property
+        def db(self):
+            if self._db is None:
+                self._db = DatabaseAPI.get_database(self.database)
+            return self._db
+
+        def close(self):
+            """
+            Writes out observations that are still buffered
+            :return:
+            """
+            if self._db is not None:
+                self._db.close()
+
+        def observation(self, uid, save_to_db=False, ver=2, out=None):
             """
             :param uid:
             :param save_to_db:
             :param ver: Version, added for backward compatibility
-            :return:
+            :param out: Optional float32 array the observation is written into
+            :return: Observation as float32 NumPy array. If out is not given, the array is reused by the next call
             """
-            food = GameSystem.players[uid].food
-            energy = GameSystem.players[uid].energy
-            coins = GameSystem.players[uid].coins
-            min_bid_skill = GameSystem.players[uid].skill["min_bid_skill"]
-            max_bid_skill = GameSystem.players[uid].skill["max_bid_skill"]
-            energy_skill = GameSystem.players[uid].skill["energy_skill"]
-            money_conversion_skill = GameSystem.players[uid].skill["money_conversion_skill"]
-            food_conversion_skill = GameSystem.players[uid].skill["food_conversion_skill"]
-            auction_skill = GameSystem.players[uid].skill["auction_skill"]
-            alive = int(GameSystem.players[uid].alive)
-            self_score = GameSystem.players[uid].score
-            skill_auction = list(GameSystem.skill_votes).index(GameSystem.skill_auction)
+            if save_to_db:
+                self._save_observation(uid)
+
+            return self.encoder.encode(uid, ver, out)
+
+        def _save_observation(self, uid):
+            player = self.game.players[uid]
 
             # Food market info [amount, start_bid]
             food_market = []
-            food_market_mid = list(GameSystem.food_market)
-            for mid in food_market_mid[:100]: # Only a 100 markets are returned. In theory, there may be more
-                if GameSystem.food_market[mid]['uid'] == uid:
-                    market_amount = GameSystem.food_market[mid]['amount']
-                    market_bid = GameSystem.food_market[mid]['start_bid']
-                    food_market.append(market_amount if market_amount else 0)
-                    food_market.append(market_bid if market_bid else 0)
-
-            #print(len(food_market))
+            for mid in list(self.game.food_market.owned_by(uid))[:100]: # Only a 100 markets are returned
+                market_amount = self.game.food_market[mid]['amount']
+                market_bid = self.game.food_market[mid]['start_bid']
+                food_market.append(market_amount if market_amount else 0)
+                food_market.append(market_bid if market_bid else 0)
+
             # If there are less than 100 markets, append empty markets
             if len(food_market) <= 200:
                 food_market.extend([0]*(200-len(food_market)))
 
-            # System information
-            food_requirement = GameSystem.food_requirement
-            day = GameSystem.day
-            global_min_bid = GameSystem.global_min_bid
-            global_max_bid = GameSystem.global_max_bid
-
             scores = []
             players_alive = []
-            for player in GameSystem.players:
-                if player == uid:
+            for other in self.game.players:
+                if other == uid:
                     continue
 
-                scores.append(GameSystem.players[player].score)
-                players_alive.append(int(GameSystem.players[player].alive))
-            if save_to_db:
-                db_obs = {
-                            "uid": uid,
-                            "alive": alive,
-                            "food": food,
-                            "energy": energy,
-                            "coins": coins,
-                            "score": self_score,
-                            "other_scores": [*scores],
-                            "day": day,
-                            "food_requirement": food_requirement,
-                            "min_bid_skill": min_bid_skill,
-                            "max_bid_skill": max_bid_skill,
-                            "energy_skill": energy_skill,
-                            "money_conversion_skill": money_conversion_skill,
-                            "food_conversion_skill": food_conversion_skill,
-                            "auction_skill": auction_skill,
-                            "global_min_bid": global_min_bid,
-                            "global_max_bid": global_max_bid,
-                            "food_market": [*food_market],
-                            "players_alive": [*players_alive],
-                            "action_memory": [*GameSystem.players[uid].action_memory],
-                         }
-                self.db.store_observation(db_obs, duplicate=False)
-
-            if ver == 1:
-                obs = [*GameSystem.players[uid].action_memory,
-                       food, energy, coins,
-                       min_bid_skill, max_bid_skill, energy_skill, money_conversion_skill, food_conversion_skill, auction_skill,
-                       alive, food_requirement, day,
-                       global_min_bid, global_max_bid, *food_market,
-                       *scores, self_score]
-            elif ver == 2:
-                obs = [*GameSystem.players[uid].action_memory,
-                       food, energy, coins,
-                       min_bid_skill, max_bid_skill, energy_skill, money_conversion_skill, food_conversion_skill,
-                       auction_skill,
-                       alive, food_requirement, day,
-                       global_min_bid, global_max_bid, *food_market,
-                       *scores, *players_alive,self_score]
-            elif ver == 3:
-                obs = [*GameSystem.players[uid].action_memory,
-                       food, energy, coins,
-                       min_bid_skill, max_bid_skill, energy_skill, money_conversion_skill, food_conversion_skill, auction_skill,
-                       skill_auction,
-                       alive, food_requirement, day,
-                       global_min_bid, global_max_bid, *food_market,
-                       *scores, *players_alive, self_score]
-            return obs
-
-        def do_action(self, uid, action):
+                scores.append(self.game.players[other].score)
+                players_alive.append(int(self.game.players[other].alive))
+
+            db_obs = {
+                        "uid": uid,
+                        "alive": int(player.alive),
+                        "food": player.food,
+                        "energy": player.energy,
+                        "coins": player.coins,
+                        "score": player.score,
+                        "other_scores": [*scores],
+                        "day": self.game.day,
+                        "food_requirement": self.game.food_requirement,
+                        "min_bid_skill": player.skill["min_bid_skill"],
+                        "max_bid_skill": player.skill["max_bid_skill"],
+                        "energy_skill": player.skill["energy_skill"],
+                        "money_conversion_skill": player.skill["money_conversion_skill"],
+                        "food_conversion_skill": player.skill["food_conversion_skill"],
+                        "auction_skill": player.skill["auction_skill"],
+                        "global_min_bid": self.game.global_min_bid,
+                        "global_max_bid": self.game.global_max_bid,
+                        "food_market": [*food_market],
+                        "players_alive": [*players_alive],
+                        "action_memory": [*player.action_memory],
+                     }
+            self.db.store_observation(db_obs, duplicate=False)
+
+        def do_action(self, uid, action, ver=2):
             """
             Actions heavily depend on dictionaries being in order of assignment. Be cautious in Python < 3.7
             :param uid:
             :param action: Format is [[0, 1, 2, 3]*10] where 0 == Action ID and 1, 2, 3 are parameters
-            :return:
+            :param ver: Version of the returned observation, None to skip building it
+            :return: Observation of the player
             """
             if type(action) == int:
                 action = self._int_to_actions(action)
+            if self.recorder is not None:
+                self.recorder.record(uid, action)
 
             player = self._get_player(uid)
             self.player = player # Please please please fix this
 
-            action_list = list(self.actions) # This might bug out in Python < 3.7
+            action_list = self.action_names # This might bug out in Python < 3.7
             # Checking if action is valid
             invalid_action = False
             if action[0] < len(action_list):
@@ -264,78 +295,83 @@ class GameAPI:
                 # Checking if enough actions are present to end turn
                 if len(self.bot_actions[uid]) >= 3:
                     player.end_turn()
-                    turn_ended = GameSystem.do_turn(self.bot_actions)
+                    turn_ended = self.game.do_turn(self.bot_actions)
 
                     # If all bot actions have ended, empty the action list
                     if turn_ended:
                         self.bot_actions = {}
             if invalid_action:
-                GameSystem.players[uid].invalid_action = True
+                self.game.players[uid].invalid_action = True
             else:
-                GameSystem.players[uid].invalid_action = False
-            return self.observation(uid)
+                self.game.players[uid].invalid_action = False
+            if ver is None:
+                return None
+            return self.observation(uid, ver=ver)
 
 
         def _get_player(self, uid):
-            return GameSystem.players[uid]
+            return self.game.players[uid]
 
         def _param_to_uid(self, param):
-            uids = list(GameSystem.players)
-
-            if param in uids:
-                return uids[param]
+            # Membership is checked on the dict, so the uids are only listed when needed
+            if param in self.game.players:
+                return list(self.game.players)[param]
             return -1
 
         def _param_to_mid(self, param):
-            mids = list(GameSystem.food_market)
-
-            if param in mids:
-                return mids[param]
+            if param in self.game.food_market:
+                return param
             return -1
 
         def _param_to_skill(self, param):
-            skills = list(GameSystem.skill_votes)
+            skills = list(self.game.skill_votes)
 
             if param in skills:
                 return skills[param]
             return -1
 
         def _param_to_food_vote(self, param):
-            food_votes = list(GameSystem.food_votes)
+            food_votes = list(self.game.food_votes)
 
             if param in food_votes:
                 return food_votes[param]
             return -1
 
         def _int_to_actions(self, i):
-            action = 1
-            actions = self.actions
-            action_list = list(actions)
-
-            temp = np.prod(actions[action_list[0]])
-
             # Preventing over and underflow
             if i > self.action_boundary:
                 i = self.action_boundary
             elif i < 0:
                 i = 0
-            # Choosing which action is being taken
-            while temp < i:
-                # Making sure action does not overflow
-                if action >= len(action_list):
-                    action = 0
-
-                add_to_temp = np.prod(actions[action_list[action]])
-                temp += add_to_temp
-                action += 1
 
-            action -= 1
-            temp -= np.prod(actions[action_list[action]])
+            # Choosing which action is being taken, the first one whose upper boundary is >= i
+            action = bisect_left(self.action_bounds, i)
+            temp = self.action_bounds[action] - self.action_sizes[action]
 
             params_temp = i - temp
             params = self._decode_params(params_temp, 100)
             return [action, *params]
 
+        def decode_actions(self, actions):
+            """
+            Vectorised _int_to_actions
+            :param actions: Array of integer actions
+            :return: Array of shape (len(actions), 4), rows are [action ID, param 1, param 2, param 3]
+            """
+            i = np.clip(np.asarray(actions, dtype=np.int64).reshape(-1), 0, self.action_boundary)
+
+            action = np.searchsorted(self._action_bounds_array, i, side='left')
+            params = i - (self._action_bounds_array[action] - self._action_sizes_array[action])
+
+            # Same as _decode_params with max_index 100, ceil(a / b) written as -(-a // b)
+            max_index = 100
+            third = -(-params // max_index ** 2)
+            coeff = (third - 1) * max_index ** 2
+            second = -(-(params - coeff) // max_index)
+            first = params - ((second - 1) * max_index + coeff)
+
+            return np.stack([action, first, second, third], axis=1)
+
         def _decode_params(self, i, max_index):
             # The last parameter changes only when first and second have exhausted their combinations
             # TODO Make sure the third parameter does not go over max_index
@@ -352,13 +388,11 @@ class GameAPI:
             return [first, second, third]
 
         def _get_boundaries(self, write=False):
-            action_list = list(self.actions)
-            boundary = 0
-            for i in range(len(list(self.actions))):
-                if write:
-                    print(action_list[i], "\t", boundary + 1, "\t", boundary + np.prod(self.actions[action_list[i]]))
-                boundary += np.prod(self.actions[action_list[i]])
-            return boundary
+            if write:
+                for i in range(len(self.action_names)):
+                    print(self.action_names[i], "\t", self.action_bounds[i] - self.action_sizes[i] + 1, "\t",
+                          self.action_bounds[i])
+            return self.action_bounds[-1]
 
         def _coin_percentage(self, param):
             coins = math.ceil(param / 100 * self.player.coins)
@@ -0,0 +1,329 @@
+import numpy as np
+from collections import deque
+from collections.abc import MutableMapping
+from .game_system import GameSystem, Player
+
+# Order of the columns in the skill matrix. Same order as Player.skill
+SKILLS = ["min_bid_skill",
+          "max_bid_skill",
+          "energy_skill",
+          "money_conversion_skill",
+          "food_conversion_skill",
+          "auction_skill"]
+
+FOOD_VOTES = ["increase_min_bid",
+              "decrease_min_bid",
+              "increase_max_bid",
+              "decrease_max_bid"]
+
+
+class ArrayView(MutableMapping):
+    """
+    Dict-like view of a row of a NumPy array, so code written for dicts ({name: value}) keeps working.
+    Keys are kept in the same order as the dicts they replace.
+    """
+    def __init__(self, keys, get_row):
+        self._keys = keys
+        self._index = {key: i for i, key in enumerate(keys)}
+        self._get_row = get_row  # Rows are fetched on every access as arrays may be reallocated when they grow
+
+    def __getitem__(self, key):
+        return self._get_row()[self._index[key]].item()
+
+    def __setitem__(self, key, value):
+        self._get_row()[self._index[key]] = value
+
+    def __delitem__(self, key):
+        raise TypeError("Keys can not be removed from an array view")
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def index(self, key):
+        return self._index[key]
+
+
+class PlayerArrays:
+    """
+    Struct of arrays holding the state of all players in a game.
+    Row i belongs to the i-th player added to the game.
+    """
+    def __init__(self, capacity=16):
+        self.size = 0
+        self.food = np.full(capacity, Player.food, dtype=np.int64)
+        self.energy = np.full(capacity, Player.energy, dtype=np.int64)
+        self.coins = np.full(capacity, Player.coins, dtype=np.int64)
+        self.score = np.full(capacity, Player.score, dtype=np.int64)
+        self.alive = np.full(capacity, Player.alive, dtype=bool)
+        self.turn_priority = np.zeros(capacity, dtype=np.float64)
+        self.turn_ended = np.zeros(capacity, dtype=bool)
+        self.invalid_action = np.zeros(capacity, dtype=bool)
+        self.skill = np.tile(np.array([1, 1, 1, 1, 1, 0], dtype=np.int64), (capacity, 1))
+
+    def add(self):
+        """
+        Adds a row for a new player, growing the arrays if needed
+        :return: Index of the new row
+        """
+        if self.size == len(self.food):
+            self._grow(2 * len(self.food))
+        self.size += 1
+        return self.size - 1
+
+    def _grow(self, capacity):
+        old = len(self.food)
+        for name, fill in [("food", Player.food), ("energy", Player.energy), ("coins", Player.coins),
+                           ("score", Player.score), ("alive", Player.alive), ("turn_priority", 0),
+                           ("turn_ended", False), ("invalid_action", False)]:
+            array = getattr(self, name)
+            grown = np.full(capacity, fill, dtype=array.dtype)
+            grown[:old] = array
+            setattr(self, name, grown)
+
+        skill = np.tile(np.array([1, 1, 1, 1, 1, 0], dtype=np.int64), (capacity, 1))
+        skill[:old] = self.skill
+        self.skill = skill
+
+
+def _array_property(name, cast):
+    def getter(self):
+        return cast(getattr(self.game.state, name)[self.index])
+
+    def setter(self, value):
+        getattr(self.game.state, name)[self.index] = value
+
+    return property(getter, setter)
+
+
+def _maintained_property(name, cast):
+    # Columns read or written by the end of turn maintenance, pending maintenance is done before they are accessed
+    def getter(self):
+        game = self.game
+        if game._ending:
+            game._end_pending_turns()
+        return cast(getattr(game.state, name)[self.index])
+
+    def setter(self, value):
+        game = self.game
+        if game._ending:
+            game._end_pending_turns()
+        getattr(game.state, name)[self.index] = value
+
+    return property(getter, setter)
+
+
+class ArrayPlayer(Player):
+    """
+    Thin view over a row of PlayerArrays. Behaves like a regular Player.
+    """
+    food = _maintained_property("food", int)
+    energy = _array_property("energy", int)
+    coins = _maintained_property("coins", int)
+    score = _maintained_property("score", int)
+    alive = _maintained_property("alive", bool)
+    turn_priority = _array_property("turn_priority", float)
+    turn_ended = _array_property("turn_ended", bool)
+    invalid_action = _array_property("invalid_action", bool)
+
+    def __init__(self, uid, game, index):
+        self.uid = uid
+        self.game = game  # GameSystem the player belongs to
+        self.index = index  # Row in game.state
+        self.skill = ArrayView(SKILLS, lambda: self.game.state.skill[self.index])
+
+        self.action_memory = deque([0] * 20)
+
+    def _end_turn(self):
+        game = self.game
+        game._end_pending_turns()
+        game._maintain(np.array([self.index]), score=False)
+
+    def end_turn(self):
+        # The maintenance is done lazily by the game, for all players that ended their turn at once
+        game = self.game
+        game._ending.append(self.index)
+        turn_ended = game.state.turn_ended
+        if not turn_ended[self.index]:
+            turn_ended[self.index] = True
+            game.turns_ended += 1
+
+
+class ArrayGameSystem(GameSystem):
+    """
+    Game engine keeping player state in NumPy arrays (see PlayerArrays).
+    Per turn maintenance (food requirement, deaths, scores, turn resets and vote tallies) is done on whole arrays.
+    Players ending their turn are only queued, their maintenance is done at once before the next read of the
+    columns it changes or at the start of do_turn. Gives the same results as GameSystem.
+
+    Only faster in large lobbies. With the 10 players of the env every hot path is slower than GameSystem, as every
+    NumPy call costs more than the Python loop over 10 players it replaces (python -m benchmarks, ops/s):
+        do_turn 15k vs 20k, compete_mode 2.5k vs 2.9k, fork 3.9k vs 5.3k
+    It wins from about 1000 players, mostly on observations (observation_v3 63k vs 4.5k ops/s with 1000 players).
+    """
+
+    def do_reset(self):
+        self._ending = []  # Rows that ended their turn and wait for maintenance, once per end_turn call
+        super().do_reset()
+        self.state = PlayerArrays()
+
+        self.food_vote_counts = np.zeros(len(FOOD_VOTES), dtype=np.int64)
+        self.skill_vote_counts = np.zeros(len(SKILLS), dtype=np.int64)
+        self.food_votes = ArrayView(FOOD_VOTES, lambda: self.food_vote_counts)
+        self.skill_votes = ArrayView(SKILLS, lambda: self.skill_vote_counts)
+
+    def _new_player(self, uid):
+        return ArrayPlayer(uid, self, self.state.add())
+
+    @property
+    def dead_players(self):
+        if self._ending:
+            self._end_pending_turns()
+        return self._dead_players
+
+    @dead_players.setter
+    def dead_players(self, dead_players):
+        self._dead_players = dead_players
+
+    def do_turn(self, action_list):
+        self._end_pending_turns()
+        return super().do_turn(action_list)
+
+    def snapshot(self):
+        self._end_pending_turns()
+        return super().snapshot()
+
+    def end_turns(self, indexes):
+        """
+        Ends the turn of players at given rows of the state arrays, like calling end_turn of every player
+        :param indexes: Row index or array of row indexes
+        :return:
+        """
+        indexes = np.atleast_1d(np.asarray(indexes, dtype=np.intp))
+        self._ending.extend(indexes.tolist())
+        # Counting every player only once, even if their turn was already ended or the index is repeated
+        ended = np.unique(indexes[~self.state.turn_ended[indexes]])
+        self.state.turn_ended[ended] = True
+        self.turns_ended += ended.size
+
+    def _end_pending_turns(self):
+        """
+        Does the maintenance of every player that ended their turn since the last call
+        :return:
+        """
+        ending = self._ending
+        if not ending:
+            return
+        self._ending = []
+
+        if len(ending) == 1:
+            # A single player, as in games played one action at a time, is cheaper without array operations
+            state = self.state
+            index = ending[0]
+            food = int(state.food[index]) - self.food_requirement
+            state.food[index] = food
+            state.alive[index] = food >= 0
+            if food < 0:
+                self._dead_players += 1
+            state.score[index] += (int(state.coins[index]) + food) * (self.day + 1)
+            return
+
+        rows = np.array(ending, dtype=np.intp)
+        if len(set(ending)) == len(ending):
+            self._maintain(rows)
+            return
+
+        # Players that ended their turn more than once get the maintenance once per call, in rounds
+        while rows.size:
+            unique, first = np.unique(rows, return_index=True)
+            self._maintain(unique)
+            if unique.size == rows.size:
+                break
+            repeated = np.ones(rows.size, dtype=bool)
+            repeated[first] = False
+            rows = rows[repeated]
+
+    def _maintain(self, rows, score=True):
+        """
+        End of turn maintenance of players at distinct rows, see Player._end_turn and Player.end_turn
+        :param rows: Array of row indexes
+        :param score: Whether to add to the score of the players
+        :return:
+        """
+        state = self.state
+        food = state.food[rows] - self.food_requirement
+        state.food[rows] = food
+        died = food < 0
+        state.alive[rows] = ~died
+        self._dead_players += int(np.count_nonzero(died))
+        if score:
+            state.score[rows] += (state.coins[rows] + food) * (self.day + 1)
+
+    def _reset_votes(self):
+        self.skill_vote_counts[:] = 0
+        self.food_vote_counts[:] = 0
+
+    def _reset_turns(self):
+        self.state.turn_ended[:self.state.size] = False
+        self.turns_ended = 0
+
+    def _others_values(self, uid, name):
+        self._end_pending_turns()
+        index = self.players[uid].index
+        values = getattr(self.state, name)[:self.state.size]
+        return np.concatenate((values[:index], values[index + 1:]))
+
+    def _player_values(self, uid, out):
+        self._end_pending_turns()
+        index = self.players[uid].index
+        state = self.state
+        out[0] = state.food[index]
+        out[1] = state.energy[index]
+        out[2] = state.coins[index]
+        out[3:] = state.skill[index]
+
+    def _players_food(self, uids):
+        self._end_pending_turns()
+        return self.state.food[[self.players[uid].index for uid in uids]]
+
+    def _snapshot_players(self):
+        state = self.state
+        arrays = {name: getattr(state, name)[:state.size].copy() for name, dtype in self._snapshot_columns}
+        arrays["skill"] = state.skill[:state.size].copy()
+        arrays["action_memory"] = np.array([list(player.action_memory) for player in self.players.values()],
+                                           dtype=np.int64)
+        return arrays
+
+    def _restore_players(self, snapshot):
+        state = self.state
+        if not state.size:
+            return
+        for name, dtype in self._snapshot_columns:
+            getattr(state, name)[:state.size] = snapshot[name]
+        state.skill[:state.size] = snapshot["skill"]
+        for player, action_memory in zip(self.players.values(), snapshot["action_memory"].tolist()):
+            player.action_memory = deque(action_memory)
+
+    def _check_large_lobby(self):
+        # Observations read the other players as array slices, large lobbies are supported
+        pass
+
+    def _pop_turn_priorities(self):
+        votes = self.state.turn_priority[:self.state.size].copy()
+        self.state.turn_priority[:self.state.size] = 0
+        return votes
+
+    def _next_skill_auction(self):
+        # Skill with most votes goes on auction, ties go to the first skill
+        if self.skill_vote_counts.max() > 0:
+            self.skill_auction = SKILLS[int(self.skill_vote_counts.argmax())]
+
+    def _top_food_vote(self):
+        if self.food_vote_counts.max() > 0:
+            return FOOD_VOTES[int(self.food_vote_counts.argmax())]
+        return False
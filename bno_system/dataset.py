@@ -0,0 +1,184 @@
+import os
+import queue
+import threading
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+class ShardWriter:
+    """
+    Writes the observations of every player of a game as a .npy shard, ready to be served by WindowDataset.
+
+    Shards are named <name>.obs.npy with shape (steps, observation_size) in float32.
+    Targets of every step, e.g. the actions taken, are written next to them as <name>.targets.npy.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, name, observations, targets=None):
+        """
+        :param name: Name of the shard, e.g. <game id>-<uid>
+        :param observations: Array of shape (steps, observation_size)
+        :param targets: Array with one row per step, None to write no targets
+        :return: Path of the observation shard
+        """
+        path = os.path.join(self.directory, name + ".obs.npy")
+        np.save(path, np.asarray(observations, dtype=np.float32))
+        if targets is not None:
+            np.save(os.path.join(self.directory, name + ".targets.npy"), np.asarray(targets))
+        return path
+
+    def write_replay(self, replay, name, ver=3):
+        """
+        Writes a shard per player of a recorded game. Observations are taken after each action of the player and the
+        target of an observation is the decoded next action of the player [action ID, param 1, param 2, param 3].
+        The observation after an action already holds that action in its action memory, so it can't be its own target.
+        The observation after the last action of a player has no next action and is left out
+        :param replay: bno_system.recorder.GameReplay
+        :param name: Name of the game, shards are named <name>-<uid>
+        :param ver: Observation version
+        :return: Paths of the shards
+        """
+        observations = {uid: [] for uid in replay.uids}
+        actions = {uid: [] for uid in replay.uids}
+        for (api, uid, observation), action in zip(replay.steps(ver=ver), replay.records["action"]):
+            observations[uid].append(observation.copy())
+            actions[uid].append(action)
+
+        return [self.write(name + "-" + uid, observations[uid][:-1], actions[uid][1:])
+                for uid in replay.uids if len(observations[uid]) > 1]
+
+
+class WindowDataset:
+    """
+    Sliding windows of window_size consecutive observations over the shards in a directory.
+
+    Shards are memory-mapped, so the dataset can be larger than memory. Windows are strided views into the
+    shards and data is only copied when a batch is assembled. Window i of a shard covers steps i to i + window_size,
+    its target is the target of the last step.
+    """
+    def __init__(self, directory, window_size=40):
+        self.directory = directory
+        self.window_size = window_size
+
+        self.shards = []  # Memory-mapped observations of every shard with at least window_size steps
+        self.targets = []  # Memory-mapped targets of every shard or None
+        for file in sorted(os.listdir(directory)):
+            if not file.endswith(".obs.npy"):
+                continue
+            observations = np.load(os.path.join(directory, file), mmap_mode='r')
+            if len(observations) < window_size:
+                continue
+            targets_path = os.path.join(directory, file[:-len(".obs.npy")] + ".targets.npy")
+            if self.shards and observations.shape[1] != self.shards[0].shape[1]:
+                raise ValueError("Shard " + file + " has observations of size " + str(observations.shape[1]) +
+                                 ", earlier shards have size " + str(self.shards[0].shape[1]))
+            self.shards.append(observations)
+            self.targets.append(np.load(targets_path, mmap_mode='r') if os.path.exists(targets_path) else None)
+
+        # Window views of every shard, shape (steps - window_size + 1, window_size, observation_size)
+        self.windows = [sliding_window_view(shard, (window_size, shard.shape[1]))[:, 0] for shard in self.shards]
+        # Index of the first window of every shard, a window index is found with one binary search
+        self.offsets = np.cumsum([0] + [len(windows) for windows in self.windows])
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def __getitem__(self, i):
+        """
+        :param i:
+        :return: View of window i, shape (window_size, observation_size)
+        """
+        shard, start = self._locate(i)
+        return self.windows[shard][start]
+
+    def batches(self, batch_size=32, shuffle=True, seed=None, drop_last=False):
+        """
+        :param batch_size:
+        :param shuffle: Whether windows are served in random order
+        :param seed: Seed of the shuffle
+        :param drop_last: Whether the last batch is dropped if it is smaller than batch_size
+        :return: Generator of (windows, targets), windows of shape (batch, window_size, observation_size) and
+        targets of the windows or None if a shard has no targets
+        """
+        order = np.random.default_rng(seed).permutation(len(self)) if shuffle else np.arange(len(self))
+        for start in range(0, len(order), batch_size):
+            indexes = order[start:start + batch_size]
+            if drop_last and len(indexes) < batch_size:
+                break
+            yield self.batch(indexes)
+
+    def batch(self, indexes):
+        """
+        :param indexes: Window indexes
+        :return: (windows, targets) copied into new arrays, see batches
+        """
+        indexes = np.asarray(indexes, dtype=np.int64)
+        shards = np.searchsorted(self.offsets, indexes, side='right') - 1
+        starts = indexes - self.offsets[shards]
+
+        windows = np.empty((len(indexes), self.window_size, self.shards[0].shape[1]), dtype=np.float32)
+        has_targets = all(self.targets[shard] is not None for shard in np.unique(shards))
+        targets = None
+        # Windows are gathered shard by shard, one fancy index per shard
+        for shard in np.unique(shards):
+            mask = shards == shard
+            windows[mask] = self.windows[shard][starts[mask]]
+            if has_targets:
+                shard_targets = self.targets[shard][starts[mask] + self.window_size - 1]
+                if targets is None:
+                    targets = np.empty((len(indexes),) + shard_targets.shape[1:], dtype=shard_targets.dtype)
+                targets[mask] = shard_targets
+        return windows, targets
+
+    def _locate(self, i):
+        if not 0 <= i < len(self):
+            raise IndexError("Window " + str(i) + " is out of range")
+        shard = int(np.searchsorted(self.offsets, i, side='right')) - 1
+        return shard, i - int(self.offsets[shard])
+
+
+def prefetch(batches, depth=4):
+    """
+    Assembles batches on a background thread while the caller trains on the previous ones
+    :param batches: Iterator of batches, e.g. WindowDataset.batches()
+    :param depth: Number of batches prepared ahead
+    :return: Generator of the same batches
+    """
+    batch_queue = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    end = object()
+
+    def put(item):
+        # Waiting for room in the queue, unless the consumer is gone
+        while not stop.is_set():
+            try:
+                batch_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for batch in batches:
+                if not put(batch):
+                    return
+            put(end)
+        except Exception as e:
+            put(e)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            batch = batch_queue.get()
+            if batch is end:
+                return
+            if isinstance(batch, Exception):
+                raise batch
+            yield batch
+    finally:
+        # The consumer stopped early, letting the producer finish
+        stop.set()
@@ -0,0 +1,49 @@
+from collections.abc import MutableMapping
+
+
+class FoodMarket(MutableMapping):
+    """
+    Food market listings {mid: {"amount": amount, "start_bid": start_bid, "uid": owner}} in order of creation.
+
+    Behaves like the dict it replaces, but also keeps an owner -> listings index updated as listings are added and
+    removed, so a player's own listings are found without scanning the market.
+    """
+    def __init__(self):
+        self._listings = {}
+        self._owners = {}  # {uid: {mid: None}}, dict used as an ordered set
+
+    def __getitem__(self, mid):
+        return self._listings[mid]
+
+    def __setitem__(self, mid, listing):
+        if mid in self._listings:
+            self._remove_owner(mid)
+
+        self._listings[mid] = listing
+        self._owners.setdefault(listing['uid'], {})[mid] = None
+
+    def __delitem__(self, mid):
+        self._remove_owner(mid)
+        del self._listings[mid]
+
+    def __contains__(self, mid):
+        return mid in self._listings
+
+    def __iter__(self):
+        return iter(self._listings)
+
+    def __len__(self):
+        return len(self._listings)
+
+    def owned_by(self, uid):
+        """
+        :param uid: Owner of the listings
+        :return: mids of the listings owned by uid, in the order they were listed
+        """
+        return self._owners.get(uid, {}).keys()
+
+    def _remove_owner(self, mid):
+        owner = self._listings[mid]['uid']
+        del self._owners[owner][mid]
+        if not self._owners[owner]:
+            del self._owners[owner]
@@ -1,133 +1,300 @@
 import uuid
 import math
-from random import randint
 import logging
+import warnings
+import numpy as np
 from collections import deque
+from bno_system.food_market import FoodMarket
+from bno_system.order_book import OrderBook
+from bno_system.snapshot import GameSnapshot
+from bno_system.profiling import TurnProfiler
+
+
+def _to_python(value):
+    # Action parameters may be NumPy scalars, snapshot headers are stored as JSON
+    return value.item() if isinstance(value, np.generic) else value
+
 
 class GameSystem:
-    players = {}
-    dead_players = 0
-    food_requirement = 0
-    day = 1
-
-    global_min_bid = 1  # Minimum starting bid food price
-    global_max_bid = 1  # Maximum starting bid food price
-    food_bids = {}
-    food_market = {}
-
-    food_votes = {"increase_min_bid": 0,
-                  "decrease_min_bid": 0,
-                  "increase_max_bid": 0,
-                  "decrease_max_bid": 0
-                 }
-
-    skill_bids = {}
-    skill_votes = {"min_bid_skill": 0,
-                   "max_bid_skill": 0,
-                   "energy_skill": 0,
-                   "money_conversion_skill": 0,
-                   "food_conversion_skill": 0,
-                   "auction_skill": 0, }
-    skill_auction = "food_conversion_skill"    # Skill on auction
-
-    @classmethod
-    def add_player(cls, username=False):
-        uid = str(uuid.uuid4()) if not username else username
+    """
+    State of a single game. Each instance is an independent game, so any number of games can run in one process.
+    """
+    market_limit = 100  # Maximum number of listings on the food market, None for no limit
+    # Order turns with a single sort instead of nudging tied priorities, for 1000+ players. Only supported on
+    # ArrayGameSystem: observations on GameSystem still read every other player, which warns
+    large_lobby = False
+
+    def __init__(self, seed=None):
+        """
+        :param seed: Seed of the random number generator of the game. Anything numpy.random.default_rng accepts,
+        e.g. an int or a SeedSequence spawned for each game. Games with the same seed and actions play out the same
+        """
+        self.seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.rng = np.random.default_rng(self.seed_sequence)
+        self.profiler = None  # TurnProfiler recording where do_turn spends its time, disabled if None
+        self.do_reset()
+
+    def add_player(self, username=False):
+        uid = self.new_id() if not username else username
         player_num = 1 # If Username exists, increase number to be added after their username
-        while uid in cls.players:
-            uid = str(uuid.uuid4()) if not username else str(username) + "-" + str(player_num)
+        while uid in self.players:
+            uid = self.new_id() if not username else str(username) + "-" + str(player_num)
             player_num += 1
 
-        cls.players[uid] = Player(uid)
+        self.players[uid] = self._new_player(uid)
         return uid
 
+    def _new_player(self, uid):
+        return Player(uid, self)
+
+    def new_id(self):
+        """
+        :return: Random UUID string for players and market listings, drawn from the game's random number generator
+        so games with the same seed get the same ids
+        """
+        return str(uuid.UUID(bytes=self.rng.bytes(16), version=4))
 
-    @classmethod
-    def do_turn(cls, action_list):
+
+    def do_turn(self, action_list):
         """
         :param action_list: Dict of lists {uid: [actions]}
         :return:
         """
         # Checking if all players ended their turn
-        all_turns_ended = []
-        for uid in cls.players:
-            all_turns_ended.append(cls.players[uid].turn_ended)
-
-        if False in all_turns_ended:
+        if not self._all_turns_ended():
             return False
 
-        # Re-setting the votes from past turn
-        for skill in cls.skill_votes:
-            cls.skill_votes[skill] = 0
+        profiler = self.profiler
+        if profiler is not None:
+            start = profiler.start()
+            profiler.count("turns")
 
-        # Re-setting votes from past food votes
-        for vote in cls.food_votes:
-            cls.food_votes[vote] = 0
+        self._reset_votes()
+
+        priorities = self._get_priorities()
+        if profiler is not None:
+            start = profiler.lap("priorities", start)
 
-        priorities = cls._get_priorities()
         for uid in priorities:
             # Resetting player priority
-            cls.players[uid].turn_priority = 0
-            success = cls._do_actions(uid, action_list[uid])
+            self.players[uid].turn_priority = 0
+            success = self._do_actions(uid, action_list[uid])
+        if profiler is not None:
+            start = profiler.lap("actions", start)
 
         # Sorting out markets
-        success = cls._do_market_auctions()
-        if not success:
-            print("REEEEE")
+        self._do_market_auctions()
+        if profiler is not None:
+            start = profiler.lap("market_auctions", start)
 
         # Skill Auction
-        cls._do_skill_auction()
+        self._do_skill_auction()
+        if profiler is not None:
+            start = profiler.lap("skill_auction", start)
 
         # Min/max food vote auction
-        cls._do_food_votes()
+        self._do_food_votes()
+        if profiler is not None:
+            start = profiler.lap("food_votes", start)
 
         # System maintenance
-        rand_day = randint(1, cls.day)
-        cls.food_requirement = math.ceil((rand_day ** math.log10(cls.day)) / rand_day)
-        cls.day += 1
+        self._update_food_requirement()
 
         # Allowing players to resume with their turns
-        for uid in cls.players:
-            cls.players[uid].turn_ended = False
+        self._reset_turns()
+        if profiler is not None:
+            profiler.lap("maintenance", start)
 
         return True
 
-    @classmethod
-    def game_ended(cls):
-        if cls.dead_players >= len(cls.players) - 1:
+    def enable_profiling(self, profiler=None):
+        """
+        :param profiler: TurnProfiler to record into, e.g. one shared by several games. A new one if not given
+        :return: The profiler, poll it with profiler.stats()
+        """
+        self.profiler = profiler if profiler is not None else TurnProfiler()
+        return self.profiler
+
+    def snapshot(self):
+        """
+        :return: GameSnapshot of the players, market, bids, votes, day and random number generator of the game,
+        including the actions players queued for the current turn
+        """
+        uids = list(self.players)
+        uid_index = {uid: i for i, uid in enumerate(uids)}
+        mids = list(self.food_market)
+        bids = self.food_bids.bids()
+
+        header = {"uids": uids,
+                  "mids": mids,
+                  "bid_mids": [mid for mid, uid, bid, priority in bids],
+                  "skill_auction": self.skill_auction,
+                  "market_failures": self.market_failures,
+                  "pending_actions": {uid: [{"name": action["name"], "params": [_to_python(param)
+                                                                               for param in action["params"]]}
+                                            for action in actions]
+                                      for uid, actions in self.pending_actions.items()},
+                  "rng": self.rng.bit_generator.state,
+                  "market_limit": self.market_limit,
+                  "large_lobby": self.large_lobby}
+        for name in ["day", "dead_players", "turns_ended", "food_requirement", "global_min_bid", "global_max_bid"]:
+            header[name] = getattr(self, name)
+
+        arrays = self._snapshot_players()
+        arrays.update({
+            "listing_owner": np.array([uid_index[self.food_market[mid]['uid']] for mid in mids], dtype=np.int64),
+            "listing_amount": np.array([self.food_market[mid]['amount'] for mid in mids]),
+            "listing_start_bid": np.array([self.food_market[mid]['start_bid'] for mid in mids]),
+            "bid_bidder": np.array([uid_index[uid] for mid, uid, bid, priority in bids], dtype=np.int64),
+            "bid": np.array([bid for mid, uid, bid, priority in bids]),
+            "bid_priority": np.array([priority for mid, uid, bid, priority in bids]),
+            "skill_bid_bidder": np.array([uid_index[uid] for uid in self.skill_bids], dtype=np.int64),
+            "skill_bid": np.array(list(self.skill_bids.values())),
+            "food_votes": np.array(list(self.food_votes.values())),
+            "skill_votes": np.array(list(self.skill_votes.values())),
+        })
+        return GameSnapshot(header, arrays)
+
+    def restore(self, snapshot):
+        """
+        Replaces the state of the game with a snapshot. The snapshot is not changed and can be restored again
+        :param snapshot: GameSnapshot, e.g. of another game of the same engine
+        :return:
+        """
+        header = snapshot.header
+        self.do_reset()
+        uids = header["uids"]
+        for uid in uids:
+            self.players[uid] = self._new_player(uid)
+        self._restore_players(snapshot)
+
+        for mid, owner, amount, start_bid in zip(header["mids"], snapshot["listing_owner"].tolist(),
+                                                 snapshot["listing_amount"].tolist(),
+                                                 snapshot["listing_start_bid"].tolist()):
+            self.food_market[mid] = {"amount": amount, "start_bid": start_bid, "uid": uids[owner]}
+        for mid, bidder, bid, priority in zip(header["bid_mids"], snapshot["bid_bidder"].tolist(),
+                                              snapshot["bid"].tolist(), snapshot["bid_priority"].tolist()):
+            self.food_bids.add(mid, uids[bidder], bid, priority)
+        self.skill_bids = {uids[bidder]: bid for bidder, bid in zip(snapshot["skill_bid_bidder"].tolist(),
+                                                                     snapshot["skill_bid"].tolist())}
+        for votes, counts in [(self.food_votes, snapshot["food_votes"]), (self.skill_votes, snapshot["skill_votes"])]:
+            for vote, count in zip(list(votes), counts.tolist()):
+                votes[vote] = count
+
+        for name in ["day", "dead_players", "turns_ended", "food_requirement", "global_min_bid", "global_max_bid",
+                     "skill_auction", "market_limit", "large_lobby"]:
+            setattr(self, name, header[name])
+        self.market_failures = dict(header["market_failures"])
+        # Snapshots recorded before queued actions were stored have none
+        self.pending_actions = {uid: [{"name": action["name"], "params": list(action["params"])} for action in actions]
+                                for uid, actions in header.get("pending_actions", {}).items()}
+        self.rng.bit_generator.state = header["rng"]
+
+    def fork(self, seed=None):
+        """
+        :param seed: Seed of the random number generator of the fork. If not given, the fork continues with the
+        same random numbers as this game, so both play out the same with the same actions
+        :return: New game of the same engine in the same state, without profiler
+        """
+        game = type(self)(seed=seed)
+        game.restore(self.snapshot())
+        if seed is not None:
+            game.rng = np.random.default_rng(seed)
+        return game
+
+    # Player columns of a snapshot, (name, dtype). Skills and action memories are stored as matrices
+    _snapshot_columns = [("food", None), ("energy", None), ("coins", None), ("score", None), ("alive", bool),
+                         ("turn_priority", np.float64), ("turn_ended", bool), ("invalid_action", bool)]
+
+    def _snapshot_players(self):
+        players = list(self.players.values())
+        arrays = {name: np.array([getattr(player, name) for player in players], dtype=dtype)
+                  for name, dtype in self._snapshot_columns}
+        arrays["skill"] = np.array([list(player.skill.values()) for player in players], dtype=np.int64)
+        arrays["action_memory"] = np.array([list(player.action_memory) for player in players], dtype=np.int64)
+        return arrays
+
+    def _restore_players(self, snapshot):
+        players = list(self.players.values())
+        for name, dtype in self._snapshot_columns:
+            for player, value in zip(players, snapshot[name].tolist()):
+                setattr(player, name, value)
+        for player, skills, action_memory in zip(players, snapshot["skill"].tolist(),
+                                                 snapshot["action_memory"].tolist()):
+            player.skill = dict(zip(player.skill, skills))
+            player.action_memory = deque(action_memory)
+
+    def _all_turns_ended(self):
+        # Players count themselves in turns_ended when they end their turn, so no player has to be checked
+        return self.turns_ended >= len(self.players)
+
+    def _reset_votes(self):
+        # Re-setting the votes from past turn
+        for skill in self.skill_votes:
+            self.skill_votes[skill] = 0
+
+        # Re-setting votes from past food votes
+        for vote in self.food_votes:
+            self.food_votes[vote] = 0
+
+    def _reset_turns(self):
+        for uid in self.players:
+            self.players[uid].turn_ended = False
+        self.turns_ended = 0
+
+    def _update_food_requirement(self):
+        rand_day = int(self.rng.integers(1, self.day, endpoint=True))
+        self.food_requirement = math.ceil((rand_day ** math.log10(self.day)) / rand_day)
+        self.day += 1
+
+    def game_ended(self):
+        if self.dead_players >= len(self.players) - 1:
             return True
         return False
 
-    @classmethod
-    def do_reset(cls):
+    def do_reset(self):
         # Resetting system
-        cls.players = {}
-        cls.dead_players = 0
-        cls.food_requirement = 0
-        cls.day = 1
-
-        cls.global_min_bid = 1  # Minimum starting bid food price
-        cls.global_max_bid = 1  # Maximum starting bid food price
-        cls.food_bids = {}
-        cls.food_market = {}
-
-        cls.skill_bids = {}
-        cls.skill_votes = {"min_bid_skill": 0,
-                           "max_bid_skill": 0,
-                           "energy_skill": 0,
-                           "money_conversion_skill": 0,
-                           "food_conversion_skill": 0,
-                           "auction_skill": 0}
-        cls.skill_auction = "food_conversion_skill"
-
-    @classmethod
-    def _get_priorities(cls):
-        # First get all priorities
+        self.players = {}
+        self.dead_players = 0
+        self.turns_ended = 0  # Number of players that ended their turn
+        self.pending_actions = {}  # Actions queued by a BotAPI for the current turn, {uid: [action]}
+        self.food_requirement = 0
+        self.day = 1
+
+        self.global_min_bid = 1  # Minimum starting bid food price
+        self.global_max_bid = 1  # Maximum starting bid food price
+        self.food_bids = OrderBook()
+        self.food_market = FoodMarket()
+        self.market_failures = {}  # {mid: reason} of the listings that had bids but were not sold last turn
+
+        self.food_votes = {"increase_min_bid": 0,
+                           "decrease_min_bid": 0,
+                           "increase_max_bid": 0,
+                           "decrease_max_bid": 0
+                           }
+
+        self.skill_bids = {}
+        self.skill_votes = {"min_bid_skill": 0,
+                            "max_bid_skill": 0,
+                            "energy_skill": 0,
+                            "money_conversion_skill": 0,
+                            "food_conversion_skill": 0,
+                            "auction_skill": 0}
+        self.skill_auction = "food_conversion_skill"    # Skill on auction
+
+    def _get_priorities(self):
+        if self.large_lobby:
+            self._check_large_lobby()
+            return self._get_sorted_priorities()
+
+        # First get all priorities, nudged as plain floats instead of through the players
         priorities = {}
-        for player in cls.players:
-            priority_exists = randint(0, 1)  # Randomly choose if priority will be added or taken away
+        # Randomly choose if priority will be added or taken away, one draw for all players
+        priorities_exist = self.rng.integers(0, 1, size=len(self.players), endpoint=True)
+        votes = self._pop_turn_priorities().tolist()  # Clears the players priorities
+        for player, priority, priority_exists in zip(self.players, votes, priorities_exist.tolist()):
             new_priority = [-0.01, 0.01]  # Priority to be added or taken away
-            while cls.players[player].turn_priority in priorities:
+            while priority in priorities:
                 """
                 If two players have the same priority,
                     randomly add, remove a priority until they have a unique priority.
@@ -135,10 +302,8 @@ class GameSystem:
                         a) not change the resulting priority too high/low
                         b) give a buffer space between whole priorities
                 """
-                cls.players[player].turn_priority += new_priority[priority_exists]
-            priorities[cls.players[player].turn_priority] = cls.players[player].uid
-            # Clearing players priority
-            cls.players[player].turn_priority = 0
+                priority += new_priority[priority_exists]
+            priorities[priority] = player
 
         #Swapping keys and values
         priorities = {value: key for key, value in priorities.items()}
@@ -148,119 +313,174 @@ class GameSystem:
         priorities_lst = list(priorities)
         return priorities_lst
 
-    @classmethod
-    def _get_market_priorities(cls):
-        priorities = list(cls.food_bids)
-        priorities.sort()
-
-        return priorities
-
-    @classmethod
-    def _do_market_auctions(cls):
-        success = True
-        market_priorities = cls._get_market_priorities()
-        markets_for_removal = []
-        try:
-            for market_priority in market_priorities:
-                # Looping through markets
-                for mid in cls.food_bids[market_priority]:
-                    auction = cls.food_market[mid]
-                    highest_bid = {"bid": auction['start_bid'],
-                                   "uid": False}
-                    for uid in cls.food_bids[market_priority][mid]:
-                        # Adding bids
-                        if highest_bid['bid'] < cls.food_bids[market_priority][mid][uid] <= cls.players[uid].food:
-                            highest_bid['bid'] = cls.food_bids[market_priority][mid][uid]
-                            highest_bid['uid'] = uid
-
-                    # A person won the bid
-                    if highest_bid['uid']:
-                        cls.players[highest_bid['uid']].food += auction['amount']
-                        cls.players[highest_bid['uid']].coins -= highest_bid['bid']
-                        # Adding money to auction winner
-                        cls.players[auction['uid']].coins += highest_bid['bid']
-                        # Deleting auction
-                        markets_for_removal.append(mid)
-
-            for mid in markets_for_removal:
-                del cls.food_market[mid]
-        except:
-            success = False
-        return success
-
-    @classmethod
-    def _do_skill_auction(cls):
+    def _check_large_lobby(self):
+        # Every observation reads the score and alive of all other players one by one, seconds per turn at 5000 players
+        warnings.warn("large_lobby only speeds up turn order on GameSystem, observations still scan every player. "
+                      "Use ArrayGameSystem for large lobbies", RuntimeWarning, stacklevel=4)
+
+    def _get_sorted_priorities(self):
+        """
+        Orders players by their turn votes in a single sort, ties are broken by a random key.
+        Takes O(n log n) for n players, while nudging tied priorities takes O(n^2) when most players have no votes.
+        Gives a different (but equally random) order of tied players than _get_priorities
+        :return: List of uids, most voted first
+        """
+        uids = list(self.players)
+        votes = self._pop_turn_priorities()
+        tiebreak = self.rng.random(len(uids))
+        order = np.lexsort((tiebreak, -votes))
+        return [uids[i] for i in order]
+
+    def _pop_turn_priorities(self):
+        """
+        :return: Array with the turn priority of every player, in order of self.players. Priorities are cleared
+        """
+        votes = np.fromiter((player.turn_priority for player in self.players.values()), dtype=np.float64,
+                            count=len(self.players))
+        for player in self.players.values():
+            player.turn_priority = 0
+        return votes
+
+    def _others_values(self, uid, name):
+        """
+        :param uid: Player to leave out
+        :param name: Attribute of the players, e.g. score or alive
+        :return: Values of the attribute of every other player, in order of self.players
+        """
+        return [getattr(player, name) for other, player in self.players.items() if other != uid]
+
+    def _player_values(self, uid, out):
+        """
+        Writes food, energy, coins and the 6 skills of a player into out, as they appear in observations
+        :param uid:
+        :param out: Array of length 9
+        :return:
+        """
+        player = self.players[uid]
+        out[:] = (player.food, player.energy, player.coins, *player.skill.values())
+
+    def _players_food(self, uids):
+        """
+        :param uids:
+        :return: Array with the food of the players
+        """
+        return np.fromiter((self.players[uid].food for uid in uids), dtype=np.float64, count=len(uids))
+
+    def _do_market_auctions(self):
+        """
+        Settles the bids of this turn, every listing is sold at most once (see OrderBook.settle).
+        Bids last one turn, listings stay on the market until they are sold.
+        :return: {mid: reason} of listings with bids that were not sold
+        """
+        sold, failures = self.food_bids.settle(self.food_market, self._players_food)
+        for mid, uid, bid in sold:
+            listing = self.food_market.pop(mid)
+            self.players[uid].food += listing['amount']
+            self.players[uid].coins -= bid
+            # Adding money to the owner of the listing
+            self.players[listing['uid']].coins += bid
+
+        if self.profiler is not None:
+            self.profiler.count("bids", len(self.food_bids))
+            self.profiler.count("markets_settled", len(sold))
+            self.profiler.count("failed_market_auctions", len(failures))
+        # Bids below the start bid or above the bidder's food are part of the game, anything else is an error
+        errors = {mid: reason for mid, reason in failures.items() if reason not in ("bid_too_low", "insufficient_food")}
+        if errors:
+            logging.error("Market auctions failed: " + str(errors))
+        if len(errors) < len(failures):
+            logging.debug("Market auctions without a valid bid: " +
+                          str({mid: reason for mid, reason in failures.items() if mid not in errors}))
+
+        self.food_bids.clear()
+        self.market_failures = failures
+        return failures
+
+    def _do_skill_auction(self):
         # Skill Auction
         max_bid = {'uid': False,
                    'bid': 0}
-        for uid in cls.skill_bids:
-            if max_bid['bid'] < cls.skill_bids[uid] <= cls.players[uid].coins:
-                max_bid['bid'] = cls.skill_bids[uid]
+        for uid in self.skill_bids:
+            if max_bid['bid'] < self.skill_bids[uid] <= self.players[uid].coins:
+                max_bid['bid'] = self.skill_bids[uid]
                 max_bid['uid'] = uid
 
         # Making sure an auction is actually taking place
-        if max_bid['uid'] and cls.skill_auction:
-            cls.players[max_bid['uid']].skill[cls.skill_auction] += 1
-            cls.players[max_bid['uid']].coins -= max_bid['bid']
+        if max_bid['uid'] and self.skill_auction:
+            self.players[max_bid['uid']].skill[self.skill_auction] += 1
+            self.players[max_bid['uid']].coins -= max_bid['bid']
 
             # Distributing money to people with "auction_skill"
             total_auction_skills = 0
             players_to_receive_auction_coins = {}
-            for uid in cls.players:
-                if cls.players[uid].skill['auction_skill'] and uid not in cls.skill_bids:
-                    total_auction_skills += cls.players[uid].skill['auction_skill']
+            for uid in self.players:
+                if self.players[uid].skill['auction_skill'] and uid not in self.skill_bids:
+                    total_auction_skills += self.players[uid].skill['auction_skill']
                     # Adding uid so the player can receive their money
-                    players_to_receive_auction_coins[uid] = cls.players[uid].skill['auction_skill']
+                    players_to_receive_auction_coins[uid] = self.players[uid].skill['auction_skill']
 
             for uid in players_to_receive_auction_coins:
-                cls.players['uid'].coins += int(cls.players[uid].skill['auction_skill'] / total_auction_skills \
+                self.players['uid'].coins += int(self.players[uid].skill['auction_skill'] / total_auction_skills \
                                                 * max_bid['bid'])
 
         # Adding next skill for auction
+        self._next_skill_auction()
+
+    def _next_skill_auction(self):
         highest_vote = 0
-        for skill in cls.skill_votes:
-            if cls.skill_votes[skill] > highest_vote:
-                cls.skill_auction = skill
-                highest_vote = cls.skill_votes[skill]
+        for skill in self.skill_votes:
+            if self.skill_votes[skill] > highest_vote:
+                self.skill_auction = skill
+                highest_vote = self.skill_votes[skill]
 
-    @classmethod
-    def _do_actions(cls, uid, action_list):
+    def _do_actions(self, uid, action_list):
         """
         Do actions per player.
         :param action_list: Actions for one player
         :return: Boolean -> Has the action executed successfully?
         """
-        player = cls.players[uid]
+        player = self.players[uid]
         result = False
         if not player.alive:
             return False
 
         # Executing actions
+        invalid_actions = 0
         for action in action_list:
             result = getattr(player, action['name'])(*action['params'])
-            if not result:
+            # Some actions return None on success, only False is a failed action
+            if result is False:
                 #logging.error(action['name'] + "failed to execute with params:" + str(*action['params']))
-                pass
+                invalid_actions += 1
 
+        if self.profiler is not None:
+            self.profiler.count("actions", len(action_list))
+            self.profiler.count("invalid_actions", invalid_actions)
         return result
 
-    @classmethod
-    def _do_food_votes(cls):
+    def _do_food_votes(self):
+        vote = self._top_food_vote()
+
+        if vote == "increase_min_bid":
+            self.global_min_bid += 1
+        elif vote == "decrease_min_bid" and self.global_min_bid > 0:
+            self.global_min_bid -= 1
+        elif vote == "increase_max_bid":
+            self.global_max_bid += 1
+        elif vote == "decrease_max_bid" and self.global_max_bid > 0:
+            self.global_max_bid -= 1
+
+    def _top_food_vote(self):
+        """
+        :return: Food vote with most votes or False if nobody voted
+        """
         max_vote = {'votes': 0,
                     'type': False}
-        for vote in cls.food_votes:
-            if cls.food_votes[vote] > max_vote['votes']:
-                max_vote['votes'] = cls.food_votes[vote]
+        for vote in self.food_votes:
+            if self.food_votes[vote] > max_vote['votes']:
+                max_vote['votes'] = self.food_votes[vote]
                 max_vote['type'] = vote
-
-        if max_vote['type'] == "increase_min_bid":
-            cls.global_min_bid += 1
-        elif max_vote['type'] == "decrease_min_bid" and cls.global_min_bid > 0:
-            cls.global_min_bid -= 1
-        elif max_vote['type'] == "increase_max_bid":
-            cls.global_max_bid += 1
-        elif max_vote['type'] == "decrease_max_bid" and cls.global_max_bid > 0:
-            cls.global_max_bid -= 1
+        return max_vote['type']
 
 
 class Player:
@@ -277,8 +497,9 @@ class Player:
     turn_ended = False
     invalid_action = False  # Tracking whether a player took an invalid action
 
-    def __init__(self, uid):
+    def __init__(self, uid, game):
         self.uid = uid
+        self.game = game  # GameSystem the player belongs to
 
         # Skills, expressed in %/100 (1 = 100%)
         self.skill = {"min_bid_skill": 1,
@@ -296,19 +517,21 @@ class Player:
         Maintenance when turn has ended
         :return:
         """
-        self.food -= GameSystem.food_requirement
+        self.food -= self.game.food_requirement
         self.alive = True if self.food >= 0 else False
 
         if not self.alive:
-            GameSystem.dead_players += 1
+            self.game.dead_players += 1
 
     def _get_min_max_food_bid(self):
-        return GameSystem.global_min_bid * self.skill['min_bid_skill'], GameSystem.global_max_bid * self.skill['max_bid_skill']
+        return self.game.global_min_bid * self.skill['min_bid_skill'], self.game.global_max_bid * self.skill['max_bid_skill']
 
     # Actions
     def end_turn(self):
         self._end_turn()
-        self.score += (self.coins + self.food) * (GameSystem.day + 1)
+        self.score += (self.coins + self.food) * (self.game.day + 1)
+        if not self.turn_ended:
+            self.game.turns_ended += 1
         self.turn_ended = True
 
     def energy_to_coins(self, amount):
@@ -341,10 +564,11 @@ class Player:
         :return:
         """
         min_bid, max_bid = self._get_min_max_food_bid()
-        if self.food - amount < 0 or start_bid < min_bid or start_bid > max_bid or len(GameSystem.food_market) >= 100:
+        if self.food - amount < 0 or start_bid < min_bid or start_bid > max_bid or \
+                (self.game.market_limit is not None and len(self.game.food_market) >= self.game.market_limit):
             return False
 
-        GameSystem.food_market[str(uuid.uuid4())] = {"amount": amount, "start_bid": start_bid, "uid": self.uid}
+        self.game.food_market[self.game.new_id()] = {"amount": amount, "start_bid": start_bid, "uid": self.uid}
         return True
 
     # Voting actions
@@ -360,15 +584,10 @@ class Player:
         if bid > self.coins:
             return False
 
-        if mid not in list(GameSystem.food_market):
+        if mid not in self.game.food_market:
             return False
 
-        if priority not in GameSystem.food_bids:
-            GameSystem.food_bids[priority] = {}
-        if mid not in GameSystem.food_bids[priority]:
-            GameSystem.food_bids[priority][mid] = {}
-
-        GameSystem.food_bids[priority][mid][self.uid] = bid
+        self.game.food_bids.add(mid, self.uid, bid, priority)
         return True
 
     def add_food_vote(self, vote):
@@ -377,28 +596,28 @@ class Player:
         :param vote:
         :return:
         """
-        if vote not in GameSystem.food_votes:
+        if vote not in self.game.food_votes:
             return False
 
-        GameSystem.food_votes[vote] += 1
+        self.game.food_votes[vote] += 1
 
     def add_bid_for_skill_auction(self, bid):
         if bid > self.coins:
             return False
 
-        GameSystem.skill_bids[self.uid] = bid
+        self.game.skill_bids[self.uid] = bid
 
     def add_vote_for_skill_auction(self, skill):
-        if skill not in GameSystem.skill_votes:
+        if skill not in self.game.skill_votes:
             return False
 
-        GameSystem.skill_votes[skill] += 1
+        self.game.skill_votes[skill] += 1
 
     def add_vote_for_turn(self, uid):
-        if uid not in GameSystem.players:
+        if uid not in self.game.players:
             return False
 
-        GameSystem.players[uid].turn_priority += 1
+        self.game.players[uid].turn_priority += 1
 
     def do_nothing(self, x):
         pass
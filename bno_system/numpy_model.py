@@ -0,0 +1,128 @@
+import json
+import numpy as np
+
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0, out=x),
+    "tanh": np.tanh,
+    "sigmoid": lambda x: 1 / (1 + np.exp(-x)),
+}
+
+
+def _decode(value):
+    # Depending on the h5py and Keras versions, names are stored as bytes or str
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class NumpyModel:
+    """
+    Forward pass of a Keras Sequential model made of Flatten, Dense and Activation layers, in plain NumPy.
+    Used to run opponent policies without TensorFlow. Has the same predict method as a Keras model,
+    so it can be used as GameAPI.compete_mode / FoodGameEnv.enemy_model.
+    """
+    def __init__(self, layers, dtype=np.float32):
+        """
+        :param layers: List of [kernel, bias, activation], one per Dense layer
+        :param dtype: Type the weights are stored in, e.g. np.float32 or np.float16 to halve their memory.
+        Inputs and computations are at least float32, float16 can't hold inputs above 65504
+        """
+        self.dtype = np.dtype(dtype)
+        self.compute_dtype = np.result_type(self.dtype, np.float32)
+        self.layers = [(np.ascontiguousarray(kernel, dtype=self.dtype), np.asarray(bias, dtype=self.dtype), activation)
+                       for kernel, bias, activation in layers]
+        for kernel, bias, activation in self.layers:
+            if activation not in ACTIVATIONS:
+                raise ValueError("Unsupported activation: " + str(activation))
+
+    @property
+    def input_size(self):
+        return self.layers[0][0].shape[0]
+
+    def predict(self, x):
+        """
+        :param x: Batch of inputs, every sample is flattened like a Keras Flatten layer does
+        :return: Output of the model with shape (batch, units of the last layer)
+        """
+        x = np.asarray(x, dtype=self.compute_dtype)
+        x = x.reshape(len(x), -1)
+        for kernel, bias, activation in self.layers:
+            # Kernels stored as float16 are upcast for the matmul
+            x = x @ kernel.astype(self.compute_dtype, copy=False)
+            x += bias
+            x = ACTIVATIONS[activation](x)
+        return x
+
+    @classmethod
+    def from_keras(cls, model, dtype=np.float32):
+        """
+        Copies the weights of an in-memory Keras model
+        :param model: Sequential model
+        :param dtype:
+        :return: NumpyModel
+        """
+        layers = []
+        for layer in model.layers:
+            config = layer.get_config()
+            kind = layer.__class__.__name__
+            if kind == "Dense":
+                kernel, bias = layer.get_weights()
+                layers.append([kernel, bias, config["activation"]])
+            elif kind == "Activation":
+                cls._add_activation(layers, config["activation"])
+            elif kind not in ("Flatten", "InputLayer"):
+                raise ValueError("Unsupported layer: " + kind)
+        return cls(layers, dtype)
+
+    @classmethod
+    def from_h5(cls, path, dtype=np.float32):
+        """
+        Reads the Dense weights out of a Keras .h5 file (model.save or model.save_weights).
+        Files saved with save_weights have no model config, they are read as build_network in example.py
+        creates them: ReLU after every Dense layer but the last one, which is linear.
+        :param path:
+        :param dtype:
+        :return: NumpyModel
+        """
+        import h5py
+
+        with h5py.File(path, "r") as f:
+            weights = f["model_weights"] if "model_weights" in f else f
+            layer_names = [_decode(name) for name in weights.attrs["layer_names"]]
+
+            if "model_config" in f.attrs:
+                config = f.attrs["model_config"]
+                config = json.loads(_decode(config))["config"]
+                # Older Keras versions store the list of layers directly
+                config_layers = config["layers"] if isinstance(config, dict) else config
+            else:
+                dense = [name for name in layer_names if len(weights[name].attrs["weight_names"])]
+                config_layers = []
+                for name in dense:
+                    config_layers.append({"class_name": "Dense",
+                                          "config": {"name": name,
+                                                     "activation": "relu" if name != dense[-1] else "linear"}})
+
+            layers = []
+            for layer in config_layers:
+                kind = layer["class_name"]
+                config = layer["config"]
+                if kind == "Dense":
+                    group = weights[config["name"]]
+                    names = [_decode(name) for name in group.attrs["weight_names"]]
+                    kernel = group[next(name for name in names if "kernel" in name)][()]
+                    bias = group[next(name for name in names if "bias" in name)][()]
+                    layers.append([kernel, bias, config["activation"]])
+                elif kind == "Activation":
+                    cls._add_activation(layers, config["activation"])
+                elif kind not in ("Flatten", "InputLayer"):
+                    raise ValueError("Unsupported layer: " + kind)
+        return cls(layers, dtype)
+
+    @staticmethod
+    def _add_activation(layers, activation):
+        # Activation layers are merged into the Dense layer before them
+        if activation == "linear":
+            return
+        if not layers or layers[-1][2] != "linear":
+            raise ValueError("Activation " + activation + " has to follow a linear Dense layer")
+        layers[-1][2] = activation
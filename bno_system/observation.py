@@ -0,0 +1,106 @@
+import numpy as np
+
+MARKET_SLOTS = 100  # Number of markets in an observation, each market is [amount, start_bid]
+
+
+class ObservationEncoder:
+    """
+    Writes observations of a player into a float32 array.
+    The position of every field is computed once per version and number of players,
+    after that encoding only copies values into the array.
+
+    Layouts (n = number of players):
+        ver 1: action_memory, food, energy, coins, skills, alive, food_requirement, day,
+               global_min_bid, global_max_bid, food_market, scores (n - 1), score
+        ver 2: same as ver 1 with players_alive (n - 1) before score
+        ver 3: same as ver 2 with skill_auction after skills
+    """
+    def __init__(self, game):
+        self.game = game
+        self.layouts = {}  # {(ver, n_players): layout}
+        self.buffers = {}  # {ver: array} reused between calls
+
+    def size(self, ver, n_players):
+        return self._get_layout(ver, n_players)['size']
+
+    def encode(self, uid, ver=2, out=None):
+        """
+        :param uid:
+        :param ver: Version of the observation
+        :param out: Array to write the observation into. If not given, a buffer owned by the encoder is used
+        and overwritten by the next call with the same version, copy it if it has to be kept.
+        :return: Observation as float32 NumPy array
+        """
+        game = self.game
+        player = game.players[uid]
+        layout = self._get_layout(ver, len(game.players))
+
+        if out is None:
+            out = self.buffers.get(ver)
+            if out is None or len(out) != layout['size']:
+                out = self.buffers[ver] = np.zeros(layout['size'], dtype=np.float32)
+
+        start, end = layout['action_memory']
+        out[start:end] = player.action_memory
+
+        start, end = layout['player']
+        game._player_values(uid, out[start:end])
+
+        if 'skill_auction' in layout:
+            out[layout['skill_auction']] = list(game.skill_votes).index(game.skill_auction)
+
+        start, end = layout['system']
+        out[start:end] = (int(player.alive), game.food_requirement, game.day,
+                          game.global_min_bid, game.global_max_bid)
+
+        start, end = layout['food_market']
+        out[start:end] = 0
+        position = start
+        for mid in game.food_market.owned_by(uid):
+            if position == end:
+                break
+            market = game.food_market[mid]
+            out[position] = market['amount'] if market['amount'] else 0
+            out[position + 1] = market['start_bid'] if market['start_bid'] else 0
+            position += 2
+
+        start, end = layout['scores']
+        out[start:end] = game._others_values(uid, 'score')
+
+        if 'players_alive' in layout:
+            start, end = layout['players_alive']
+            out[start:end] = game._others_values(uid, 'alive')
+
+        out[layout['score']] = player.score
+        return out
+
+    def _get_layout(self, ver, n_players):
+        key = (ver, n_players)
+        if key not in self.layouts:
+            self.layouts[key] = self._build_layout(ver, n_players)
+        return self.layouts[key]
+
+    @staticmethod
+    def _build_layout(ver, n_players):
+        if ver not in (1, 2, 3):
+            raise ValueError("Unknown observation version: " + str(ver))
+
+        fields = [('action_memory', 20),
+                  ('player', 9),  # food, energy, coins and 6 skills
+                  ('skill_auction', 1 if ver == 3 else None),
+                  ('system', 5),  # alive, food_requirement, day, global_min_bid, global_max_bid
+                  ('food_market', MARKET_SLOTS * 2),
+                  ('scores', n_players - 1),
+                  ('players_alive', n_players - 1 if ver >= 2 else None),
+                  ('score', 1)]
+
+        layout = {}
+        position = 0
+        for name, length in fields:
+            if length is None:
+                # Field is not part of this version
+                continue
+            layout[name] = (position, position + length) if name not in ('skill_auction', 'score') else position
+            position += length
+        layout['size'] = position
+        return layout
@@ -0,0 +1,86 @@
+import numpy as np
+
+
+class ObservationMemory:
+    """
+    Sliding windows of the last window_size observations of every player in a game.
+
+    Windows are kept in one preallocated float32 array of shape (n_players, 2 * window_size, observation_size).
+    Every observation is written twice, window_size apart, so the window of a player is always the
+    contiguous slice [head:head + window_size] of its row and never has to be rebuilt.
+    """
+    def __init__(self, window_size=40, observation_size=None, capacity=16):
+        self.window_size = window_size
+        self.observation_size = observation_size  # Taken from the first observation if not given
+        self.capacity = capacity
+
+        self.rows = {}  # {uid: row}
+        self.heads = np.zeros(capacity, dtype=np.int64)  # Position of the oldest observation in each row
+        self.buffer = None
+        if observation_size is not None:
+            self.buffer = np.zeros((capacity, 2 * window_size, observation_size), dtype=np.float32)
+
+    def __contains__(self, uid):
+        return uid in self.rows
+
+    def append(self, uid, observation):
+        """
+        Adds an observation to the window of a player, dropping the oldest one
+        :param uid:
+        :param observation: Observation of the player, list or NumPy array
+        :return:
+        """
+        if self.buffer is None:
+            self.observation_size = len(observation)
+            self.buffer = np.zeros((self.capacity, 2 * self.window_size, self.observation_size), dtype=np.float32)
+
+        row = self._get_row(uid)
+        head = self.heads[row]
+        self.buffer[row, head] = observation
+        self.buffer[row, head + self.window_size] = observation
+        self.heads[row] = (head + 1) % self.window_size
+
+    def window(self, uid):
+        """
+        :param uid:
+        :return: View of shape (window_size, observation_size), oldest observation first
+        """
+        row = self._get_row(uid)
+        head = self.heads[row]
+        return self.buffer[row, head:head + self.window_size]
+
+    def windows(self, uids):
+        """
+        :param uids: List of players
+        :return: Array of shape (len(uids), window_size, observation_size), oldest observation first.
+        A view is returned when players occupy consecutive rows and their windows are aligned, otherwise a copy
+        """
+        rows = np.array([self._get_row(uid) for uid in uids], dtype=np.int64)
+        if len(rows) == 0:
+            return np.zeros((0, self.window_size, self.observation_size or 0), dtype=np.float32)
+
+        heads = self.heads[rows]
+        if (heads == heads[0]).all() and (np.diff(rows) == 1).all():
+            head = heads[0]
+            return self.buffer[rows[0]:rows[-1] + 1, head:head + self.window_size]
+
+        positions = heads[:, None] + np.arange(self.window_size)
+        return self.buffer[rows[:, None], positions]
+
+    def _get_row(self, uid):
+        if uid not in self.rows:
+            if len(self.rows) == self.capacity:
+                self._grow(2 * self.capacity)
+            self.rows[uid] = len(self.rows)
+        return self.rows[uid]
+
+    def _grow(self, capacity):
+        heads = np.zeros(capacity, dtype=np.int64)
+        heads[:self.capacity] = self.heads
+        self.heads = heads
+
+        if self.buffer is not None:
+            buffer = np.zeros((capacity,) + self.buffer.shape[1:], dtype=np.float32)
+            buffer[:self.capacity] = self.buffer
+            self.buffer = buffer
+        self.capacity = capacity
@@ -0,0 +1,55 @@
+from collections import OrderedDict
+from bno_system.numpy_model import NumpyModel
+
+
+class OpponentRegistry:
+    """
+    Cache of opponent models by training iteration, least recently used models are evicted first.
+    A newly promoted actor is added straight from memory, so it does not have to be saved and read back.
+    """
+    def __init__(self, capacity=4, loader=NumpyModel.from_h5, path="model_{}.h5", copy=NumpyModel.from_keras):
+        """
+        :param capacity: Maximum number of models kept in memory
+        :param loader: Function loading a model from a file, e.g. NumpyModel.from_h5 or keras load_model
+        :param path: File name of a model, formatted with the iteration
+        :param copy: Function copying an in-memory model into an opponent. The copy must not share weights
+        with the model, as the model keeps training
+        """
+        self.capacity = capacity
+        self.loader = loader
+        self.path = path
+        self.copy = copy
+        self.models = OrderedDict()  # {iteration: model}, most recently used last
+
+    def __contains__(self, iteration):
+        return iteration in self.models
+
+    def get(self, iteration):
+        """
+        :param iteration:
+        :return: Opponent model of an iteration, loaded from disk if it is not cached
+        """
+        if iteration in self.models:
+            self.models.move_to_end(iteration)
+            return self.models[iteration]
+
+        model = self.loader(self.path.format(iteration))
+        self._add(iteration, model)
+        return model
+
+    def promote(self, iteration, model):
+        """
+        Adds the weights of an in-memory model as the opponent of an iteration
+        :param iteration:
+        :param model: e.g. the actor that just became the best model
+        :return: Opponent model
+        """
+        opponent = self.copy(model)
+        self._add(iteration, opponent)
+        return opponent
+
+    def _add(self, iteration, model):
+        self.models[iteration] = model
+        self.models.move_to_end(iteration)
+        while len(self.models) > self.capacity:
+            self.models.popitem(last=False)
@@ -0,0 +1,111 @@
+import numpy as np
+
+
+class OrderBook:
+    """
+    Bids for food market listings of a single turn.
+
+    Bids are kept as flat columns (listing, bidder, bid, priority), listings and bidders are stored once and
+    referred to by index. A bid replaces an earlier bid of the same player on the same listing with the same priority.
+    settle() picks the winner of every listing in one vectorized pass:
+        - only bids above the start bid that the bidder can cover with their food are valid
+        - bids with the lowest priority number are settled first, a listing is sold to the first priority with a valid bid
+        - within a priority the highest bid wins, ties go to the earliest bid
+    Food is checked as it was before the settlement, so food won in the same settlement can not cover other bids.
+    """
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._mids = []  # Listings with bids
+        self._listing_index = {}  # {mid: index in _mids}
+        self._uids = []  # Players that placed bids
+        self._bidder_index = {}  # {uid: index in _uids}
+        self._rows = {}  # {(priority, mid, uid): row}, so a new bid replaces the old one
+
+        self._listing = []
+        self._bidder = []
+        self._bid = []
+        self._priority = []
+
+    def __len__(self):
+        return len(self._bid)
+
+    def bids(self):
+        """
+        :return: [(mid, uid, bid, priority)] in the order the bids were placed
+        """
+        return [(self._mids[listing], self._uids[bidder], bid, priority)
+                for listing, bidder, bid, priority in zip(self._listing, self._bidder, self._bid, self._priority)]
+
+    def add(self, mid, uid, bid, priority):
+        """
+        :param mid: Listing the bid is for
+        :param uid: Bidder
+        :param bid: Price per unit of food
+        :param priority: Bids with lower numbers are settled first
+        :return:
+        """
+        key = (priority, mid, uid)
+        if key in self._rows:
+            self._bid[self._rows[key]] = bid
+            return
+
+        if mid not in self._listing_index:
+            self._listing_index[mid] = len(self._mids)
+            self._mids.append(mid)
+        if uid not in self._bidder_index:
+            self._bidder_index[uid] = len(self._uids)
+            self._uids.append(uid)
+
+        self._rows[key] = len(self._bid)
+        self._listing.append(self._listing_index[mid])
+        self._bidder.append(self._bidder_index[uid])
+        self._bid.append(bid)
+        self._priority.append(priority)
+
+    def settle(self, market, food):
+        """
+        Picks the winner of every listing with bids. Neither the market nor the players are changed.
+        :param market: FoodMarket with the listings
+        :param food: Function returning the food of a list of uids as an array
+        :return: sold [(mid, uid, bid)] in order of priority, failures {mid: reason} of listings with bids that were
+        not sold. Reasons are "listing_removed", "bid_too_low" and "insufficient_food"
+        """
+        failures = {}
+        if not self._bid:
+            return [], failures
+
+        listing = np.array(self._listing, dtype=np.intp)
+        bidder = np.array(self._bidder, dtype=np.intp)
+        bid = np.array(self._bid, dtype=np.float64)
+        priority = np.array(self._priority, dtype=np.float64)
+
+        listed = np.zeros(len(self._mids), dtype=bool)
+        start_bid = np.zeros(len(self._mids), dtype=np.float64)
+        for i, mid in enumerate(self._mids):
+            if mid in market:
+                listed[i] = True
+                start_bid[i] = market[mid]['start_bid']
+            else:
+                failures[mid] = "listing_removed"
+
+        above = listed[listing] & (bid > start_bid[listing])
+        valid = above & (bid <= np.asarray(food(self._uids))[bidder])
+
+        # Sorting valid bids by listing, priority, highest bid and arrival, the first bid of every listing wins
+        rows = np.flatnonzero(valid)
+        rows = rows[np.lexsort((rows, -bid[rows], priority[rows], listing[rows]))]
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = listing[rows[1:]] != listing[rows[:-1]]
+        winners = rows[first]
+        winners = winners[np.lexsort((listing[winners], priority[winners]))]
+
+        sold_listings = np.zeros(len(self._mids), dtype=bool)
+        sold_listings[listing[winners]] = True
+        has_above = np.bincount(listing, weights=above, minlength=len(self._mids)) > 0
+        for i in np.flatnonzero(listed & ~sold_listings):
+            failures[self._mids[i]] = "insufficient_food" if has_above[i] else "bid_too_low"
+
+        sold = [(self._mids[listing[row]], self._uids[bidder[row]], self._bid[row]) for row in winners]
+        return sold, failures
@@ -0,0 +1,62 @@
+import math
+import time
+
+
+class TurnProfiler:
+    """
+    Records where GameSystem.do_turn spends its time.
+    Set it as game.profiler to enable it, games without a profiler only pay for a None check per phase.
+
+    For every phase the total time, number of calls and a histogram of call durations are kept.
+    Histogram bucket i counts calls that took less than 2 ** i microseconds (and at least 2 ** (i - 1)).
+    Counters track what happened in the turns: actions, invalid_actions, bids, markets_settled...
+    """
+    PHASES = ["priorities", "actions", "market_auctions", "skill_auction", "food_votes", "maintenance"]
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.times = {phase: 0.0 for phase in self.PHASES}
+        self.calls = {phase: 0 for phase in self.PHASES}
+        self.histograms = {phase: {} for phase in self.PHASES}
+        self.counters = {"turns": 0, "actions": 0, "invalid_actions": 0, "bids": 0, "markets_settled": 0,
+                         "failed_market_auctions": 0}
+
+    @staticmethod
+    def start():
+        return time.perf_counter()
+
+    def lap(self, phase, start):
+        """
+        Records the time since start as a call of phase
+        :param phase:
+        :param start: Value of start() or of the previous lap
+        :return: Start of the next phase
+        """
+        now = time.perf_counter()
+        elapsed = now - start
+        self.times[phase] += elapsed
+        self.calls[phase] += 1
+
+        bucket = max(0, math.ceil(math.log2(elapsed * 1e6))) if elapsed > 0 else 0
+        histogram = self.histograms[phase]
+        histogram[bucket] = histogram.get(bucket, 0) + 1
+        return now
+
+    def count(self, counter, amount=1):
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def stats(self):
+        """
+        :return: {"phases": {phase: {"seconds", "calls", "mean_seconds", "histogram_us"}}, "counters": {...}}
+        """
+        phases = {}
+        for phase in self.PHASES:
+            calls = self.calls[phase]
+            phases[phase] = {"seconds": self.times[phase],
+                             "calls": calls,
+                             "mean_seconds": self.times[phase] / calls if calls else 0,
+                             "histogram_us": {2 ** bucket: amount
+                                              for bucket, amount in sorted(self.histograms[phase].items())}}
+        return {"phases": phases, "counters": dict(self.counters)}
@@ -0,0 +1,121 @@
+import struct
+import numpy as np
+from bno_system.api import GameAPI
+from bno_system.game_system import GameSystem
+from bno_system.snapshot import GameSnapshot
+
+MAGIC = b"BNOREC1\n"
+
+# One record per BotAPI.do_action call: index of the player in the snapshot and the decoded action
+# [action ID, param 1, param 2, param 3]. Integer actions are stored decoded, both replay the same
+RECORD = np.dtype([("player", "<u4"), ("action", "<i2", (4,))])
+
+
+class GameRecorder:
+    """
+    Records a game as the snapshot it started from followed by every action passed to BotAPI.do_action.
+
+    File layout:
+        MAGIC, length of the snapshot (uint64), GameSnapshot.to_bytes(), records (RECORD) until the end of the file
+    Everything else in a game is a result of its actions and random number generator, so GameReplay can play the
+    game again and rebuild observations of any version. Changes made to the game outside of do_action are not recorded.
+    """
+    def __init__(self, api, path, buffer_size=4096):
+        """
+        :param api: BotAPI of the game, its players have to be added before recording starts
+        :param path: File the game is recorded to
+        :param buffer_size: Number of records kept in memory before they are written
+        """
+        self.api = api
+        self.path = path
+        self.player_index = {uid: i for i, uid in enumerate(api.game.players)}
+        self.buffer = np.zeros(buffer_size, dtype=RECORD)
+        self.size = 0
+
+        snapshot = api.game.snapshot().to_bytes()
+        self.file = open(path, "wb")
+        self.file.write(MAGIC + struct.pack("<Q", len(snapshot)) + snapshot)
+        api.recorder = self
+
+    def record(self, uid, action):
+        """
+        :param uid:
+        :param action: Decoded action [action ID, param 1, param 2, param 3], missing params are stored as 0
+        :return:
+        """
+        if not (-2 ** 15 <= min(action) and max(action) < 2 ** 15):
+            raise ValueError("Action " + str(action) + " does not fit in a record")
+
+        record = self.buffer[self.size]
+        record["player"] = self.player_index[uid]
+        record["action"] = 0
+        record["action"][:len(action)] = action
+        self.size += 1
+        if self.size == len(self.buffer):
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.buffer[:self.size].tobytes())
+        self.file.flush()
+        self.size = 0
+
+    def close(self):
+        """
+        Writes out buffered records and stops recording
+        :return:
+        """
+        if self.file.closed:
+            return
+        self.flush()
+        self.file.close()
+        if self.api.recorder is self:
+            self.api.recorder = None
+
+
+class GameReplay:
+    """
+    Plays a game recorded by GameRecorder again, at engine speed.
+    """
+    def __init__(self, path, game_system=GameSystem):
+        """
+        :param path: Recorded game
+        :param game_system: Engine the game is replayed on, e.g. ArrayGameSystem. Every engine gives the same results
+        """
+        self.game_system = game_system
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(str(path) + " is not a recorded game")
+            length, = struct.unpack("<Q", f.read(8))
+            self.snapshot = GameSnapshot.from_bytes(f.read(length))
+            self.records = np.frombuffer(f.read(), dtype=RECORD)
+        self.uids = self.snapshot.header["uids"]
+
+    def __len__(self):
+        return len(self.records)
+
+    def steps(self, ver=None):
+        """
+        Replays the game one action at a time
+        :param ver: Observation version to build after every action, None for no observations
+        :return: Generator of (api, uid, observation). The observation is that of the player that took the action,
+        it is overwritten by the next step, copy it if it has to be kept
+        """
+        game = self.game_system()
+        game.restore(self.snapshot)
+        api = GameAPI.BotAPI(game, database="Null")
+        for player, action in zip(self.records["player"].tolist(), self.records["action"].tolist()):
+            uid = self.uids[player]
+            yield api, uid, api.do_action(uid, action, ver=ver)
+
+    def replay(self):
+        """
+        :return: Game at the end of the recording
+        """
+        api = None
+        for api, uid, observation in self.steps():
+            pass
+        if api is None:
+            game = self.game_system()
+            game.restore(self.snapshot)
+            return game
+        return api.game
@@ -0,0 +1,165 @@
+from collections import deque, namedtuple
+import numpy as np
+
+# Same fields as rl.memory.Experience, so agents of keras-rl can read the samples
+Experience = namedtuple('Experience', 'state0, action, reward, state1, terminal1')
+
+
+class ReplayMemory:
+    """
+    Replay memory with the interface of rl.memory.SequentialMemory, for the DDPG agent in example.py.
+
+    Every step is stored once in preallocated ring arrays (observations, actions, rewards, terminals).
+    Windows of window_length observations are not stored, they are gathered for all sampled steps at once.
+    Like in SequentialMemory a window never reaches into the previous episode, the observations before the
+    start of the episode are zeros.
+    """
+    def __init__(self, limit, window_length=1, ignore_episode_boundaries=False, dtype=np.float32, seed=None):
+        """
+        :param limit: Maximum number of steps kept, the oldest steps are overwritten first
+        :param window_length: Number of consecutive observations in a state
+        :param ignore_episode_boundaries: Whether windows may reach into the previous episode
+        :param dtype: dtype observations are stored in, e.g. np.float16 to halve the memory
+        :param seed: Seed of the sampling
+        """
+        self.limit = limit
+        self.window_length = window_length
+        self.ignore_episode_boundaries = ignore_episode_boundaries
+        self.dtype = np.dtype(dtype)
+        self.rng = np.random.default_rng(seed)
+
+        # Allocated on the first append, when the shapes of observations and actions are known
+        self.observations = None
+        self.actions = None
+        self.rewards = np.zeros(limit, dtype=np.float32)
+        self.terminals = np.zeros(limit, dtype=bool)
+        self.start = 0  # Position of the oldest step in the ring arrays
+        self.length = 0
+
+        # Last observations, also those appended while not training, used to build the state of the agent
+        self.recent_observations = deque(maxlen=window_length)
+        self.recent_terminals = deque(maxlen=window_length)
+
+    @property
+    def nb_entries(self):
+        return self.length
+
+    def append(self, observation, action, reward, terminal, training=True):
+        """
+        :param observation: Observation the action was taken on
+        :param action:
+        :param reward: Reward of the action
+        :param terminal: Whether the episode ended with the action
+        :param training: Steps are only stored while training
+        :return:
+        """
+        self.recent_observations.append(observation)
+        self.recent_terminals.append(terminal)
+        if not training:
+            return
+
+        if self.observations is None:
+            self.observations = np.zeros((self.limit,) + np.shape(observation), dtype=self.dtype)
+            self.actions = np.zeros((self.limit,) + np.shape(action), dtype=np.float32)
+
+        position = (self.start + self.length) % self.limit
+        self.observations[position] = observation
+        self.actions[position] = action
+        self.rewards[position] = reward
+        self.terminals[position] = terminal
+
+        if self.length < self.limit:
+            self.length += 1
+        else:
+            self.start = (self.start + 1) % self.limit
+
+    def get_recent_state(self, current_observation):
+        """
+        :param current_observation:
+        :return: Array of shape (window_length, observation size), the last window_length observations
+        ending with current_observation
+        """
+        state = np.zeros((self.window_length,) + np.shape(current_observation), dtype=np.float32)
+        state[-1] = current_observation
+        recent = len(self.recent_observations)
+        for offset in range(1, self.window_length):
+            # Stopping at the start of the memory or of the episode
+            if recent - offset < 0 or (not self.ignore_episode_boundaries and recent - offset - 1 >= 0 and
+                                       self.recent_terminals[recent - offset - 1]):
+                break
+            state[-1 - offset] = self.recent_observations[recent - offset]
+        return state
+
+    def sample(self, batch_size, batch_idxs=None):
+        """
+        :param batch_size:
+        :param batch_idxs: Indexes of the steps to sample, drawn at random if not given
+        :return: List of Experience
+        """
+        state0, action, reward, state1, terminal1 = self.sample_batch(batch_size, batch_idxs)
+        return [Experience(state0=state0[i], action=action[i], reward=reward[i], state1=state1[i],
+                           terminal1=terminal1[i]) for i in range(len(state0))]
+
+    def sample_batch(self, batch_size, batch_idxs=None):
+        """
+        Same as sample, with every field stacked into one array
+        :param batch_size:
+        :param batch_idxs:
+        :return: state0 (batch, window_length, ...), action, reward, state1, terminal1
+        """
+        assert self.nb_entries >= self.window_length + 2, "Not enough entries in the memory"
+
+        if batch_idxs is None:
+            idxs = self.rng.integers(self.window_length + 1, self.nb_entries, size=batch_size)
+        else:
+            idxs = np.asarray(batch_idxs, dtype=np.int64) + 1
+        assert idxs.min() >= self.window_length + 1 and idxs.max() < self.nb_entries
+
+        # Steps right after the end of an episode have no state to start from, they are drawn again
+        redraw = self._terminals(idxs - 2)
+        while redraw.any():
+            idxs[redraw] = self.rng.integers(self.window_length + 1, self.nb_entries, size=int(redraw.sum()))
+            redraw = self._terminals(idxs - 2)
+
+        windows = self._windows(idxs)
+        state0 = windows[:, :-1]
+        state1 = windows[:, 1:].copy()
+        # The window of state1 ends with the observation after the action
+        state1[:, -1] = self.observations[self._positions(idxs)]
+        return (state0, self.actions[self._positions(idxs - 1)], self.rewards[self._positions(idxs - 1)],
+                state1, self._terminals(idxs - 1))
+
+    def get_config(self):
+        return {'window_length': self.window_length,
+                'ignore_episode_boundaries': self.ignore_episode_boundaries,
+                'limit': self.limit,
+                'dtype': self.dtype.name}
+
+    def _positions(self, idxs):
+        return (self.start + idxs) % self.limit
+
+    def _terminals(self, idxs):
+        # Terminals of steps before the start of the memory are False
+        return np.where(idxs >= 0, self.terminals[self._positions(np.maximum(idxs, 0))], False)
+
+    def _windows(self, idxs):
+        """
+        Gathers the window_length observations ending at idxs - 1 in one fancy index, plus one free slot at the end
+        :param idxs:
+        :return: float32 array of shape (len(idxs), window_length + 1, observation size)
+        """
+        offsets = np.arange(self.window_length - 1, -1, -1)
+        steps = (idxs - 1)[:, None] - offsets[None, :]  # Oldest step first
+
+        # A step is part of the window while no episode ended between it and the last step of the window
+        visible = steps >= 0
+        if not self.ignore_episode_boundaries:
+            ended = self._terminals(steps - 1)
+            ended[:, -1] = False
+            # Going from the newest step back, everything before an episode end is hidden
+            visible &= np.logical_and.accumulate(~ended[:, ::-1], axis=1)[:, ::-1]
+
+        windows = np.zeros((len(idxs), self.window_length + 1) + self.observations.shape[1:], dtype=np.float32)
+        gathered = self.observations[self._positions(np.maximum(steps, 0))]
+        windows[:, :-1] = np.where(visible.reshape(visible.shape + (1,) * (gathered.ndim - 2)), gathered, 0)
+        return windows
@@ -0,0 +1,110 @@
+import multiprocessing as mp
+import numpy as np
+from bno_system.api import GameAPI
+from bno_system.game_system import GameSystem
+from bno_system.numpy_model import NumpyModel
+
+# Set in every worker by _init_worker, so policies are sent to a worker once instead of with every game
+_worker_state = {}
+
+
+def simulate(policies, n_games, workers=None, seed=None, max_days=1000, game_system=GameSystem, context=None):
+    """
+    Plays complete games without the gym env, one player per policy in a random seat,
+    spread over a pool of worker processes.
+    :param policies: Policy of every player:
+        - "random": random_mode
+        - "nothing": nothing_mode
+        - a model with predict(windows), e.g. a NumpyModel, played with compete_mode. Players sharing a model
+          are predicted in one batch. Keras models can not be sent to workers, copy them with NumpyModel.from_keras
+        - a path to a .h5 file, loaded with NumpyModel.from_h5 in every worker
+    :param n_games: Number of games
+    :param workers: Number of worker processes, all CPUs if None. With 1 games are played in this process
+    :param seed: Seed every game seed is spawned from, results do not depend on the number of workers
+    :param max_days: Games still running on this day are stopped
+    :param game_system: Engine the games are played on
+    :param context: multiprocessing start method, e.g. "spawn"
+    :return: {"rankings", "survival_days", "scores"} arrays of shape (n_games, n_players), rank 1 is the highest score
+        and players alive at the end survive until the last day, "days" (n_games,) the last day of every game and
+        "rank_counts" (n_players, n_players) how often each player finished on each rank
+    """
+    seeds = np.random.SeedSequence(seed).spawn(n_games)
+    workers = workers or mp.cpu_count()
+
+    if workers == 1:
+        _init_worker(policies, game_system, max_days)
+        games = [_play_game(game_seed) for game_seed in seeds]
+    else:
+        chunk_size = max(1, n_games // (workers * 4))
+        with mp.get_context(context).Pool(workers, _init_worker, (policies, game_system, max_days)) as pool:
+            games = pool.map(_play_game, seeds, chunk_size)
+
+    rankings = np.array([game[0] for game in games], dtype=np.int64).reshape(n_games, len(policies))
+    results = {
+        "rankings": rankings,
+        "survival_days": np.array([game[1] for game in games], dtype=np.int64).reshape(n_games, len(policies)),
+        "scores": np.array([game[2] for game in games], dtype=np.int64).reshape(n_games, len(policies)),
+        "days": np.array([game[3] for game in games], dtype=np.int64),
+        "rank_counts": np.zeros((len(policies), len(policies)), dtype=np.int64),
+    }
+    for player in range(len(policies)):
+        results["rank_counts"][player] = np.bincount(rankings[:, player] - 1, minlength=len(policies))
+    return results
+
+
+def _init_worker(policies, game_system, max_days):
+    models = {}  # Every .h5 file is loaded once per worker
+    loaded = []
+    for policy in policies:
+        if isinstance(policy, str) and policy not in ("random", "nothing"):
+            if policy not in models:
+                models[policy] = NumpyModel.from_h5(policy)
+            policy = models[policy]
+        loaded.append(policy)
+
+    _worker_state.update(policies=loaded, game_system=game_system, max_days=max_days)
+
+
+def _play_game(seed):
+    """
+    :param seed: SeedSequence of the game
+    :return: rankings, survival days and scores of the players and the last day of the game
+    """
+    policies = _worker_state["policies"]
+    # Seats are shuffled every game, so neither the order players are added and act in nor the tie break of the
+    # rankings favours a policy. Results stay in the order of the policies
+    seats = np.random.default_rng(seed.spawn(1)[0]).permutation(len(policies))
+    game = _worker_state["game_system"](seed=seed)
+    api = GameAPI.BotAPI(game, database="Null")
+    uids = [None] * len(policies)
+    for player in seats:
+        uids[player] = game.add_player()
+
+    # Players are grouped by policy, so players sharing a model are predicted together
+    groups = {}
+    for player in seats:
+        policy = policies[player]
+        key = policy if isinstance(policy, str) else id(policy)
+        groups.setdefault(key, (policy, []))[1].append(uids[player])
+    game_apis = {key: GameAPI() for key in groups}
+
+    survival_days = np.zeros(len(uids), dtype=np.int64)
+    while not game.game_ended() and game.day <= _worker_state["max_days"]:
+        for key, (policy, players) in groups.items():
+            if policy == "random":
+                GameAPI.random_mode(players, api)
+            elif policy == "nothing":
+                GameAPI.nothing_mode(players, api)
+            else:
+                game_apis[key].compete_mode(policy, players, api)
+
+        for i, uid in enumerate(uids):
+            if not survival_days[i] and not game.players[uid].alive:
+                survival_days[i] = game.day
+
+    scores = np.array([game.players[uid].score for uid in uids], dtype=np.int64)
+    survival_days[survival_days == 0] = game.day
+    rankings = np.empty(len(uids), dtype=np.int64)
+    # Tied players are ranked by seat
+    rankings[seats[np.argsort(-scores[seats], kind='stable')]] = np.arange(1, len(uids) + 1)
+    return rankings.tolist(), survival_days.tolist(), scores.tolist(), game.day
@@ -0,0 +1,45 @@
+import io
+import json
+import numpy as np
+
+
+class GameSnapshot:
+    """
+    Frozen state of a game, made by GameSystem.snapshot() and loaded with GameSystem.restore().
+
+    Numbers are kept as NumPy columns (one row per player, listing or bid), strings and scalars in a small header.
+    The columns are read-only, so one snapshot can be shared by any number of restores and forks,
+    games copy the columns when they restore them and never write to the snapshot.
+    """
+    def __init__(self, header, arrays):
+        """
+        :param header: Dict of JSON serializable values: uids, mids, day, rng state...
+        :param arrays: Dict of NumPy arrays
+        """
+        self.header = header
+        self.arrays = arrays
+        for array in arrays.values():
+            array.flags.writeable = False
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in self.arrays.values())
+
+    def to_bytes(self):
+        """
+        :return: Snapshot as bytes, an uncompressed .npz archive with the header stored as JSON
+        """
+        buffer = io.BytesIO()
+        header = np.frombuffer(json.dumps(self.header).encode(), dtype=np.uint8)
+        np.savez(buffer, __header__=header, **self.arrays)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data):
+        with np.load(io.BytesIO(data)) as archive:
+            arrays = {name: archive[name] for name in archive.files}
+        header = json.loads(arrays.pop('__header__').tobytes().decode())
+        return cls(header, arrays)
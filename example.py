@@ -1,21 +1,21 @@
 import numpy as np
 import gym
-import datetime
 
 import tensorflow as tf
-from tensorflow.keras.models import Sequential, Model, load_model
+from tensorflow.keras.models import Sequential, Model
 from tensorflow.keras.layers import Dense, Activation, Flatten, Input, Concatenate
 from tensorflow.keras.optimizers import Adam
 from tensorflow.python.framework.ops import disable_eager_execution
 
 from rl.agents import DDPGAgent
-from rl.memory import SequentialMemory
 from rl.random import OrnsteinUhlenbeckProcess
 
-from scipy import stats
 from configparser import ConfigParser
 import os.path
 
+from bno_system.opponents import OpponentRegistry
+from bno_system.replay_memory import ReplayMemory
+
 WINDOW_SIZE = 40
 
 # Setting and reading configuration file
@@ -115,19 +115,21 @@ if os.path.exists("model_" + str(iteration) + "_actor.h5"):
     model_actor.load_weights("model_" + str(iteration) + "_actor.h5")
     model_critic.load_weights("model_" + str(iteration) + "_critic.h5")
 
-memory = SequentialMemory(limit=1000000, window_length=WINDOW_SIZE)
+memory = ReplayMemory(limit=1000000, window_length=WINDOW_SIZE)
 random_process = OrnsteinUhlenbeckProcess(size=nb_actions, theta=.15, mu=0., sigma=.3)
 agent = DDPGAgent(nb_actions=nb_actions, actor=model_actor, critic=model_critic, critic_action_input=action_input,
                   memory=memory, nb_steps_warmup_critic=1000, nb_steps_warmup_actor=1000,
                   random_process=random_process, gamma=1, target_model_update=0.001)
 agent.compile(Adam(lr=.001, clipnorm=.01), metrics=['mae'])
 
+# Opponents are cached between rounds and run in NumPy
+opponents = OpponentRegistry(capacity=4)
+
 rounds = 1
 while rounds <= 10:
     if iteration > 0:
-        player_actor = load_model("model_" + str(iteration) + ".h5")
         print("Competing against", "model_" + str(iteration) + ".h5")
-        env.enemy_model = player_actor
+        env.enemy_model = opponents.get(iteration)
 
     agent.fit(env, nb_steps=10000, visualize=False, verbose=3, nb_max_episode_steps=1000)
 
@@ -141,6 +143,8 @@ while rounds <= 10:
         iteration += 1
 
         model_actor.save("model_" + str(iteration) + ".h5", overwrite=True)
+        # Next round competes against the new best actor without reading it back from disk
+        opponents.promote(iteration, model_actor)
         model_critic.save("critic_" + str(iteration) + ".h5", overwrite=True)
         agent.save_weights('model_' + str(iteration) + '.h5', overwrite=True)
 
@@ -1 +1,3 @@
-from gym_foodgame.envs.foodgame_env import FoodGameEnv
\ No newline at end of file
+from gym_foodgame.envs.foodgame_env import FoodGameEnv
+from gym_foodgame.envs.foodgame_vec_env import FoodGameVecEnv
+from gym_foodgame.envs.foodgame_pool import FoodGameEnvPool
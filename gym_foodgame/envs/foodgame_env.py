@@ -1,10 +1,11 @@
+import os
+import uuid
 import gym
 from gym import spaces
 import numpy as np
-from scipy import stats
-from random import randint
 from bno_system import GameAPI
 from bno_system import GameSystem
+from bno_system.recorder import GameRecorder
 
 
 class FoodGameEnv(gym.Env):
@@ -15,9 +16,17 @@ class FoodGameEnv(gym.Env):
   turn = 1 # Counts actions in a turn 0 - 9
 
   enemy_model = None
+  # Game engine. ArrayGameSystem is the NumPy backed engine, it is slower than GameSystem with the 10 players of the
+  # env and only pays off with 1000+ players (see its docstring)
+  game_system = GameSystem
+  database = "Mongo" # Where render saves observations, set to "Null" to not save them
+  profiler = None # Set to a bno_system.profiling.TurnProfiler to profile the turns of every game, poll profiler.stats()
+  recordings = None # Directory every game is recorded to (see bno_system.recorder), None to not record games
+  recorder = None
 
   def __init__(self):
-    api = GameAPI.BotAPI()
+    self.game = self.game_system()
+    api = GameAPI.BotAPI(self.game)
     glob_max = np.finfo(np.float32).max
     glob_min = np.finfo(np.float32).min
 
@@ -36,17 +45,51 @@ class FoodGameEnv(gym.Env):
     self.action_score = 0  # 10 is maximum score that can be gained
     self.game_api = GameAPI()
     self.reward = 0 # Reward added over time
+    self.seed()
+
+  def seed(self, seed=None):
+    """
+    Every game played by the env gets its own random number generator, spawned from this seed
+    :param seed:
+    :return:
+    """
+    self.seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    return [self.seed_sequence.entropy]
+
+  def reset(self, snapshot=None):
+    """
+    :param snapshot: GameSnapshot of a game with 10 players to start from instead of day 1, e.g. game.snapshot()
+    taken on a late day. The game continues with its own random numbers, so resets to one snapshot play out differently
+    :return: First observation
+    """
+    # Writing out what is left of the previous game before its api is replaced
+    if getattr(self, 'api', None) is not None:
+      self.api.close()
+    if self.recorder is not None:
+      self.recorder.close()
+      self.recorder = None
 
-  def reset(self):
     # Resetting game
-    self.api = GameAPI.BotAPI()
+    seed = self.seed_sequence.spawn(1)[0]
+    self.game = self.game_system(seed=seed)
+    if snapshot is not None:
+      self.game.restore(snapshot)
+      self.game.rng = np.random.default_rng(seed)
+    self.api = GameAPI.BotAPI(self.game, self.database)
+    if self.profiler is not None:
+      self.game.enable_profiling(self.profiler)
     self.game_api = GameAPI()
 
-    GameSystem.do_reset()
-    self.players = [GameSystem.add_player() for x in range(10)]
+    if snapshot is not None:
+      self.players = list(self.game.players)
+    else:
+      self.players = [self.game.add_player() for x in range(10)]
 
     # Setting the player to be any of the 3
-    self.player_uid = self.players[randint(0, len(self.players) - 1)]
+    self.player_uid = self.players[self.game.rng.integers(len(self.players))]
+    # Recording starts after the seat is drawn, replays start from the same random numbers as the game
+    if self.recordings is not None:
+      self.recorder = GameRecorder(self.api, os.path.join(self.recordings, str(uuid.uuid4()) + ".rec"))
     self.current_step = 0
 
     self.action_score = 0
@@ -54,28 +97,48 @@ class FoodGameEnv(gym.Env):
     self.reward = 0
     return self._next_observation()
 
-  def _next_observation(self):
-    obs = self.api.observation(self.player_uid, ver=3)
+  def _next_observation(self, out=None):
+    if out is not None:
+      return self.api.observation(self.player_uid, ver=3, out=out)
+
+    # The API reuses its observation array, the env hands out its own copy
+    obs = self.api.observation(self.player_uid, ver=3).copy()
 
     return obs
 
-  def step(self, action):
+  def opponent_windows(self):
+    """
+    Observes the other players for the next step, like compete_mode does before predicting.
+    Call step with the predictions of enemy_model for the windows as opponent_actions afterwards
+    :return: Windows of the other players (n_players - 1, 40, observation size)
+    """
+    return self.game_api.compete_windows(self._other_players(), self.api)
+
+  def step(self, action, opponent_actions=None, out=None):
+    """
+    :param action:
+    :param opponent_actions: Predictions of enemy_model for opponent_windows(), e.g. made by FoodGameVecEnv for
+    all its games at once. If not given, the other players are observed and predicted here
+    :param out: float32 array of shape (254,) the observation is written into, e.g. a row of the stacked observations
+    of FoodGameVecEnv. A new array is returned if not given
+    :return:
+    """
     # Making sure the actions aren't negative
     action = int(action)
-    observation = self._take_action(action)
+    self._take_action(action, opponent_actions)
 
     self.current_step += 1
 
-    self.score = GameSystem.players[self.player_uid].score
-    self.day = GameSystem.day
+    self.score = self.game.players[self.player_uid].score
+    self.day = self.game.day
 
     # Letting the game run beyond the actual end of the game. Teaching the bot to just survive for the longest
-    done = False if GameSystem.players[self.player_uid].alive else True
+    done = False if self.game.players[self.player_uid].alive else True
 
-    obs = self._next_observation()
+    obs = self._next_observation(out)
 
     # Checking if action is valid
-    if GameSystem.players[self.player_uid].invalid_action:
+    if self.game.players[self.player_uid].invalid_action:
       if self.action_score > -3:
         bias = -3 + self.turn - 1 # Adjusting so that even first bad move results in very bad bias
         self.action_score += bias
@@ -99,8 +162,9 @@ class FoodGameEnv(gym.Env):
 
     # Add player scores when turn is up
     if self.turn >= 3:
-      self.all_scores = observation[
-                        -len(self.players):]  # Adding current scores so that it can be scaled between 0 and 1
+      # Same values as at the end of the observation of do_action, the env's observation ends with the same fields
+      self.all_scores = obs[
+                        -len(self.players):].copy()  # Adding current scores so that it can be scaled between 0 and 1
       # Get ranking score (0 - 1)
       if (max(self.all_scores) - min(self.all_scores)) == 0:
         ranking_score = 0
@@ -114,7 +178,7 @@ class FoodGameEnv(gym.Env):
       reward = self.reward + norm_action_score
 
       # Adding big reward if game ended and player is still alive
-      if GameSystem.players[self.player_uid].alive and not done:
+      if self.game.players[self.player_uid].alive and not done:
         reward += self.score * self.day
 
       # Ticking over turn
@@ -123,22 +187,28 @@ class FoodGameEnv(gym.Env):
     self.turn += 1
     return obs, reward, done, {}
 
-  def _take_action(self, action):
+  def _other_players(self):
     other_players = self.players.copy()
     other_players.remove(self.player_uid)
+    return other_players
+
+  def _take_action(self, action, opponent_actions=None):
+    other_players = self._other_players()
     # Compete against random bots
     #GameAPI.random_mode(other_players, self.api)
 
     # Compete against trained bots
-    self.game_api.compete_mode(self.enemy_model, other_players, self.api)
+    if opponent_actions is None:
+      self.game_api.compete_mode(self.enemy_model, other_players, self.api)
+    else:
+      self.game_api.compete_actions(opponent_actions, other_players, self.api)
 
     # Compete against one random and one trained bot
     #GameAPI.nothing_mode(other_players, self.api)
-    obs = self.api.do_action(self.player_uid, action)
+    # The observation of the action is not built, step observes the player once afterwards
+    self.api.do_action(self.player_uid, action, ver=None)
     self.took_action = action
 
-    return obs
-
   def render(self, mode='human'):
     """
     Gets ranking. star_UID used to add a star to see how the trained bot ranked
@@ -146,16 +216,27 @@ class FoodGameEnv(gym.Env):
     :return: None
     """
     self.api.observation(self.player_uid, save_to_db=True, ver=3)
-    if GameSystem.game_ended() or not GameSystem.players[self.player_uid].alive:
+    if self.game.game_ended() or not self.game.players[self.player_uid].alive:
       all_scores = {}
 
       # Gettting all scores
-      for uid in GameSystem.players:
-        all_scores[uid] = GameSystem.players[uid].score
+      for uid in self.game.players:
+        all_scores[uid] = self.game.players[uid].score
 
       # Sorting scores
       all_scores = {k: v for k, v in sorted(all_scores.items(), key=lambda item: item[1], reverse=True)}
       ranking = (list(all_scores).index(self.player_uid))+1
-      print("Player ranked:", ranking, "with score:", all_scores[self.player_uid], "on day", GameSystem.day,
-            "and ended up", "alive" if GameSystem.players[self.player_uid].alive else "dead")
-      self.game_results.append(ranking)
\ No newline at end of file
+      print("Player ranked:", ranking, "with score:", all_scores[self.player_uid], "on day", self.game.day,
+            "and ended up", "alive" if self.game.players[self.player_uid].alive else "dead")
+      self.game_results.append(ranking)
+
+      # Game is over, writing out its buffered observations
+      self.api.db.flush()
+
+  def close(self):
+    # Writing out the observations and the recording of the last game
+    if getattr(self, 'api', None) is not None:
+      self.api.close()
+    if self.recorder is not None:
+      self.recorder.close()
+      self.recorder = None
@@ -0,0 +1,223 @@
+import multiprocessing as mp
+import traceback
+from multiprocessing import shared_memory
+import numpy as np
+from gym_foodgame.envs.foodgame_env import FoodGameEnv
+
+OBSERVATION_SIZE = 254
+
+
+def _shared_array(shm, shape, dtype):
+  return np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _worker(remote, parent_remote, env_fn, names, num_envs, start, count):
+  """
+  Steps envs [start, start + count) of the pool. Actions are read from and results written to shared memory,
+  the pipe only carries short commands and acknowledgements.
+  An exception stops the worker, it is sent to the pool with its traceback and raised there.
+  """
+  parent_remote.close()
+  envs = []
+  blocks = {}
+  shared = {}  # Views into the blocks
+  try:
+    envs = [env_fn() for x in range(count)]
+    for name, shm_name in names.items():
+      blocks[name] = shared_memory.SharedMemory(name=shm_name)
+    shared['actions'] = _shared_array(blocks['actions'], (num_envs,), np.int64)[start:start + count]
+    for name in ['observations', 'terminal']:
+      shared[name] = _shared_array(blocks[name], (num_envs, OBSERVATION_SIZE), np.float32)[start:start + count]
+    shared['rewards'] = _shared_array(blocks['rewards'], (num_envs,), np.float32)[start:start + count]
+    shared['dones'] = _shared_array(blocks['dones'], (num_envs,), bool)[start:start + count]
+    actions, observations, terminal, rewards, dones = [shared[name] for name in
+                                                       ['actions', 'observations', 'terminal', 'rewards', 'dones']]
+
+    while True:
+      command, data = remote.recv()
+      if command == 'step':
+        for i, env in enumerate(envs):
+          obs, reward, done, info = env.step(actions[i], out=observations[i])
+          if done:
+            terminal[i] = obs
+            observations[i] = env.reset()
+          rewards[i] = reward
+          dones[i] = done
+      elif command == 'reset':
+        for i, env in enumerate(envs):
+          observations[i] = env.reset()
+      elif command == 'seed':
+        for env, seed in zip(envs, data):
+          env.seed(seed)
+      elif command == 'close':
+        break
+      remote.send((None, None))
+  except Exception as e:
+    error = traceback.format_exc()
+    try:
+      remote.send((e, error))
+    except Exception:
+      # The exception can't be pickled, its traceback is enough
+      remote.send((RuntimeError(repr(e)), error))
+  finally:
+    for env in envs:
+      env.close()
+    # Views into the blocks have to be released before the blocks can be closed
+    actions = observations = terminal = rewards = dones = None
+    shared.clear()
+    for block in blocks.values():
+      block.close()
+    remote.close()
+
+
+class FoodGameEnvPool:
+  """
+  Runs food games in worker processes. Each worker owns envs_per_worker envs.
+  Actions, observations, rewards and dones are exchanged through shared memory arrays, so nothing is pickled
+  per step. Pipes are only used to dispatch commands and wait for the workers to finish a step.
+
+  Same interface as FoodGameVecEnv: step takes an action array of shape (num_envs,) and returns stacked
+  observations, rewards and dones. Finished games are reset automatically, their last observation
+  is in info["terminal_observation"].
+
+  env_fn has to be picklable (e.g. a module level function) and should set up the enemy model of the env,
+  as models can not be sent to the workers.
+
+  An exception in a worker is raised by the call that was waiting for it, with the traceback of the worker as its
+  cause. The worker stops, so the pool can only be closed afterwards.
+
+  The shared memory is freed by close(), use the pool in a with block to close it when an exception is raised:
+      with FoodGameEnvPool(4) as pool:
+          observations = pool.reset()
+  """
+  def __init__(self, num_workers=None, envs_per_worker=4, env_fn=FoodGameEnv, context=None):
+    self.num_workers = num_workers or mp.cpu_count()
+    self.envs_per_worker = envs_per_worker
+    self.num_envs = self.num_workers * envs_per_worker
+    self.closed = False
+    self._blocks = {}
+    self.remotes, self.processes = [], []
+    self.actions = self.observations = self.terminal = self.rewards = self.dones = None
+    try:
+      self._start(env_fn, context)
+    except BaseException:
+      # Freeing the shared memory and stopping the workers started so far
+      self.close()
+      raise
+
+  def _start(self, env_fn, context):
+    shapes = {'actions': ((self.num_envs,), np.int64),
+              'observations': ((self.num_envs, OBSERVATION_SIZE), np.float32),
+              'terminal': ((self.num_envs, OBSERVATION_SIZE), np.float32),
+              'rewards': ((self.num_envs,), np.float32),
+              'dones': ((self.num_envs,), bool)}
+    for name, (shape, dtype) in shapes.items():
+      size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+      self._blocks[name] = shared_memory.SharedMemory(create=True, size=size)
+    self.actions, self.observations, self.terminal, self.rewards, self.dones = \
+      [_shared_array(self._blocks[name], shape, dtype) for name, (shape, dtype) in shapes.items()]
+    names = {name: block.name for name, block in self._blocks.items()}
+
+    ctx = mp.get_context(context)
+    for worker in range(self.num_workers):
+      remote, worker_remote = ctx.Pipe()
+      process = ctx.Process(target=_worker, args=(worker_remote, remote, env_fn, names, self.num_envs,
+                                                  worker * self.envs_per_worker, self.envs_per_worker), daemon=True)
+      self.remotes.append(remote)
+      try:
+        process.start()
+      finally:
+        worker_remote.close()
+      self.processes.append(process)
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.close()
+
+  def seed(self, seed=None):
+    """
+    Seeds every env with its own stream spawned from seed, the same streams as FoodGameVecEnv.seed
+    :param seed:
+    :return:
+    """
+    seed_sequence = np.random.SeedSequence(seed)
+    seeds = seed_sequence.spawn(self.num_envs)
+    self._command('seed', [seeds[worker * self.envs_per_worker:(worker + 1) * self.envs_per_worker]
+                           for worker in range(self.num_workers)])
+    return [seed_sequence.entropy]
+
+  def reset(self):
+    self._command('reset')
+    return self.observations.copy()
+
+  def step(self, actions):
+    """
+    :param actions: Array of shape (num_envs,) with one integer action per game
+    :return: observations (num_envs, 254), rewards (num_envs,), dones (num_envs,), list of infos
+    """
+    self.actions[:] = np.asarray(actions).reshape(self.num_envs)
+    self._command('step')
+
+    infos = [{} for x in range(self.num_envs)]
+    for i in np.flatnonzero(self.dones):
+      infos[i]['terminal_observation'] = self.terminal[i].copy()
+    return self.observations.copy(), self.rewards.copy(), self.dones.copy(), infos
+
+  def close(self):
+    if self.closed:
+      return
+    self.closed = True
+    try:
+      for remote in self.remotes:
+        try:
+          remote.send(('close', None))
+        except (BrokenPipeError, EOFError):
+          pass  # Worker already stopped
+      for process in self.processes:
+        process.join(timeout=10)
+        if process.is_alive():
+          process.terminate()
+          process.join()
+    finally:
+      for remote in self.remotes:
+        remote.close()
+      # The arrays have to be released before their shared memory is closed
+      self.actions = self.observations = self.terminal = self.rewards = self.dones = None
+      for block in self._blocks.values():
+        block.close()
+        block.unlink()
+
+  def _command(self, command, data=None):
+    """
+    :param command: 'step', 'reset', 'seed' or 'close'
+    :param data: List with data for every worker, None if the command has none
+    :return:
+    """
+    if self.closed:
+      raise RuntimeError("The pool is closed")
+    for worker, remote in enumerate(self.remotes):
+      try:
+        remote.send((command, data[worker] if data is not None else None))
+      except (BrokenPipeError, EOFError):
+        pass  # Reported while waiting below
+
+    # Waiting for every worker, this is the step barrier. All answers are read before an error is raised,
+    # so the pipes of the other workers stay in sync
+    errors = []
+    for worker, remote in enumerate(self.remotes):
+      try:
+        error, worker_traceback = remote.recv()
+      except (EOFError, ConnectionResetError):
+        self.processes[worker].join(timeout=1)
+        error = RuntimeError("Worker " + str(worker) + " stopped with exit code " +
+                             str(self.processes[worker].exitcode))
+        worker_traceback = None
+      if error is not None:
+        errors.append((error, worker_traceback))
+    if errors:
+      error, worker_traceback = errors[0]
+      if worker_traceback is None:
+        raise error
+      raise error from RuntimeError("Traceback of the worker:\n" + worker_traceback)
@@ -0,0 +1,116 @@
+import numpy as np
+from gym_foodgame.envs.foodgame_env import FoodGameEnv
+
+
+class FoodGameVecEnv:
+  """
+  Steps num_envs independent food games per call.
+  Every game is a regular FoodGameEnv, so rewards are exactly those of the single env.
+  The opponents of all games are predicted together, one predict call per step on an array of shape
+  (num_envs * opponents, 40, observation size), instead of one call per game.
+  Only the predict call is batched. Every game is still stepped in Python, observing and playing its 10 players
+  takes about 250 us per game step, so a vec env runs at about 4k env steps/s per core at most. The gain over
+  stepping games one by one grows with the cost of a predict call: measured with a 40 * 253 -> 64 -> 1 NumpyModel,
+  16 envs ran at about 1.5k env steps/s against 0.9k for one env, with a model that costs nothing both ran at 3.9k.
+  Observations, rewards and dones are returned as stacked NumPy arrays and finished games are reset automatically.
+  """
+  def __init__(self, num_envs=8):
+    self.num_envs = num_envs
+    self.envs = [FoodGameEnv() for x in range(num_envs)]
+
+    self.action_space = self.envs[0].action_space
+    self.observation_space = self.envs[0].observation_space
+
+    self._windows = None  # Opponent windows of all games, allocated on the first step
+
+  def seed(self, seed=None):
+    """
+    Seeds every env with its own stream spawned from seed
+    :param seed:
+    :return:
+    """
+    seed_sequence = np.random.SeedSequence(seed)
+    for env, env_seed in zip(self.envs, seed_sequence.spawn(self.num_envs)):
+      env.seed(env_seed)
+    return [seed_sequence.entropy]
+
+  @property
+  def enemy_model(self):
+    return self.envs[0].enemy_model
+
+  @enemy_model.setter
+  def enemy_model(self, model):
+    for env in self.envs:
+      env.enemy_model = model
+
+  def reset(self):
+    observations = np.empty((self.num_envs,) + self.observation_space.shape, dtype=np.float32)
+    for i, env in enumerate(self.envs):
+      observations[i] = env.reset()
+    return observations
+
+  def step(self, actions):
+    """
+    :param actions: Array of shape (num_envs,) with one integer action per game
+    :return: observations (num_envs, 254), rewards (num_envs,), dones (num_envs,), list of infos
+    When a game is done, its final observation is stored in info["terminal_observation"]
+    and the returned observation is the first one of the next game.
+    """
+    actions = np.asarray(actions).reshape(self.num_envs)
+    opponent_actions = self._predict_opponents()
+
+    # New arrays every step, so the caller can keep them. Every game writes its observation straight into its row
+    observations = np.empty((self.num_envs,) + self.observation_space.shape, dtype=np.float32)
+    rewards = np.empty(self.num_envs, dtype=np.float32)
+    dones = np.empty(self.num_envs, dtype=bool)
+    infos = []
+    for i, env in enumerate(self.envs):
+      obs, reward, done, info = env.step(actions[i], opponent_actions[i], out=observations[i])
+      if done:
+        info = dict(info, terminal_observation=obs.copy())
+        observations[i] = env.reset()
+
+      rewards[i] = reward
+      dones[i] = done
+      infos.append(info)
+    return observations, rewards, dones, infos
+
+  def _predict_opponents(self):
+    """
+    Observes the opponents of every game and predicts their actions, one predict call per enemy model
+    :return: List with the opponent actions of every game
+    """
+    windows = [env.opponent_windows() for env in self.envs]
+    bounds = np.cumsum([0] + [len(env_windows) for env_windows in windows])
+    shape = (int(bounds[-1]),) + windows[0].shape[1:]
+    if self._windows is None or self._windows.shape != shape:
+      self._windows = np.empty(shape, dtype=np.float32)
+    np.concatenate(windows, out=self._windows)
+
+    # Games are grouped by enemy model, normally all games share one model
+    groups = {}
+    for i, env in enumerate(self.envs):
+      groups.setdefault(id(env.enemy_model), (env.enemy_model, []))[1].append(i)
+
+    opponent_actions = [None] * self.num_envs
+    for model, games in groups.values():
+      if len(games) == self.num_envs:
+        predictions = model.predict(self._windows)
+      else:
+        rows = np.concatenate([np.arange(bounds[i], bounds[i + 1]) for i in games])
+        predictions = model.predict(self._windows[rows])
+      predictions = np.asarray(predictions)
+      position = 0
+      for i in games:
+        size = bounds[i + 1] - bounds[i]
+        opponent_actions[i] = predictions[position:position + size]
+        position += size
+    return opponent_actions
+
+  def render(self, mode='human'):
+    for env in self.envs:
+      env.render(mode)
+
+  def close(self):
+    for env in self.envs:
+      env.close()
@@ -0,0 +1,41 @@
+import numpy as np
+from bno_system import GameAPI, GameSystem, ArrayGameSystem
+
+
+def play(engine, seed, steps=1500, players=6):
+    """
+    Players act in random order, so some end their turn several times before it is played, and every action is
+    followed by an observation, which reads the players in the middle of the turn
+    """
+    game = engine(seed=seed)
+    api = GameAPI.BotAPI(game, database="Null")
+    uids = [game.add_player() for x in range(players)]
+    rng = np.random.default_rng(seed)
+    observations = []
+    for step in range(steps):
+        uid = uids[int(rng.integers(players))]
+        observations.append(api.do_action(uid, int(rng.integers(0, api.action_boundary)), ver=3).tolist())
+    players_state = [(player.food, player.energy, player.coins, player.score, player.alive, dict(player.skill))
+                     for player in game.players.values()]
+    return observations, players_state, game.day, game.dead_players
+
+
+def test_same_results_as_game_system():
+    for seed in range(3):
+        assert play(ArrayGameSystem, seed) == play(GameSystem, seed)
+
+
+def test_turns_ended_together():
+    games = []
+    for engine in [GameSystem, ArrayGameSystem]:
+        game = engine(seed=0)
+        uids = [game.add_player() for x in range(5)]
+        actions = {uid: [{"name": "energy_to_food", "params": [3]}] * 3 for uid in uids}
+        for turn in range(40):
+            for i, uid in enumerate(uids):
+                for x in range(1 + (turn + i) % 3):
+                    game.players[uid].end_turn()
+            game.do_turn(actions)
+        games.append(([(player.food, player.score, player.alive) for player in game.players.values()],
+                      game.day, game.dead_players))
+    assert games[0] == games[1]
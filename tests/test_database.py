@@ -0,0 +1,28 @@
+import pytest
+from DatabaseAPI.DatabaseAPI import Mongo
+
+
+def test_buffered_games_get_distinct_ids():
+    mongomock = pytest.importorskip("mongomock")
+    client = mongomock.MongoClient()
+    games = [Mongo(client=client, flush_interval=60) for x in range(2)]
+    # Both games store before either one writes its buffer
+    for i, game in enumerate(games):
+        assert game.store_observation({"day": 1, "player": i})
+    for game in games:
+        game.close()
+
+    collection = client["BNO"]["Observations"]
+    assert sorted(collection.distinct("game_id")) == [1, 2]
+    assert collection.count_documents({}) == 2
+
+
+def test_game_ids_continue_after_stored_games():
+    mongomock = pytest.importorskip("mongomock")
+    client = mongomock.MongoClient()
+    client["BNO"]["Observations"].insert_one({"game_id": 7, "day": 1})
+
+    game = Mongo(client=client)
+    game.store_observation({"day": 1})
+    game.close()
+    assert game.game_id == 8
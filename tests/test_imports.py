@@ -0,0 +1,28 @@
+import os
+import subprocess
+import sys
+from benchmarks.imports import IMPORT_MODULES, OPTIONAL_MODULES
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Seconds importing the packages may take in a new worker process. They take about 0.12s, and about 0.6s when the
+# optional backends are imported eagerly
+IMPORT_BUDGET = 0.35
+
+
+def test_import_budget():
+    code = ("import sys\n"
+            "import " + ", ".join(IMPORT_MODULES) + "\n"
+            "print(','.join(m for m in " + repr(OPTIONAL_MODULES) + " if m in sys.modules))")
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, capture_output=True,
+                            text=True, check=True)
+
+    # Lines of -X importtime: "import time: self [us] | cumulative [us] | module", nested imports are indented
+    cumulative = {}
+    for line in output.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line and "cumulative" not in line:
+            self_time, total, module = line[len("import time:"):].split("|")
+            cumulative[module.strip()] = int(total)
+
+    assert output.stdout.strip() == "", "Importing the packages loads " + output.stdout.strip()
+    seconds = sum(cumulative[module] for module in IMPORT_MODULES) / 1e6
+    assert seconds < IMPORT_BUDGET, "Importing the packages takes " + str(round(seconds, 3)) + "s"
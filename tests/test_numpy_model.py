@@ -0,0 +1,33 @@
+import os
+import numpy as np
+import pytest
+from bno_system import NumpyModel
+
+MODEL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model_13.h5")
+
+
+def inputs(size, scale=100, seed=0):
+    # Observations are counts of food, coins, bids... of a few hundred at most
+    return np.random.default_rng(seed).uniform(0, scale, size=(64, 1, size)).astype(np.float32)
+
+
+def test_matches_keras():
+    tf = pytest.importorskip("tensorflow")
+    keras_model = tf.keras.models.load_model(MODEL, compile=False)
+    model = NumpyModel.from_h5(MODEL)
+    x = inputs(model.input_size)
+
+    np.testing.assert_allclose(model.predict(x), keras_model.predict(x, verbose=0), rtol=1e-4, atol=1e-2)
+
+
+def test_float16_weights_keep_large_inputs_finite():
+    pytest.importorskip("h5py")
+    model = NumpyModel.from_h5(MODEL)
+    half = NumpyModel.from_h5(MODEL, dtype=np.float16)
+    x = inputs(model.input_size)
+    x[:, :, 0] = 1e5  # Above the largest float16
+
+    out = half.predict(x)
+    assert out.dtype == np.float32
+    assert np.isfinite(out).all()
+    np.testing.assert_allclose(out, model.predict(x), rtol=1e-2, atol=1.0)
@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+from bno_system.simulate import simulate
+
+
+@pytest.mark.parametrize("policy", ["nothing", "random"])
+def test_identical_policies_get_even_ranks(policy):
+    n_games = 200
+    results = simulate([policy] * 5, n_games, workers=1, seed=0)
+
+    # Every player finishes on every rank in about a fifth of the games, binomial with a deviation of about 6
+    assert (results["rank_counts"].sum(axis=1) == n_games).all()
+    assert np.abs(results["rank_counts"] - n_games / 5).max() < 20, results["rank_counts"]
+
+
+def test_results_do_not_depend_on_workers():
+    policies = ["random", "random", "nothing"]
+    single = simulate(policies, 8, workers=1, seed=3)
+    pool = simulate(policies, 8, workers=2, seed=3)
+    for key in single:
+        np.testing.assert_array_equal(single[key], pool[key])
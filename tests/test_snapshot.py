@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from bno_system import GameAPI, GameSystem, ArrayGameSystem
+from bno_system.snapshot import GameSnapshot
+
+
+def state(game):
+    snapshot = game.snapshot()
+    return snapshot.header, {name: snapshot[name].tolist() for name in snapshot.arrays}
+
+
+def new_game(engine, players=4, seed=0):
+    game = engine(seed=seed)
+    api = GameAPI.BotAPI(game, database="Null")
+    uids = [game.add_player() for x in range(players)]
+    return game, api, uids
+
+
+@pytest.mark.parametrize("engine", [GameSystem, ArrayGameSystem])
+def test_fork_mid_turn(engine):
+    game, api, uids = new_game(engine)
+    actions = np.random.default_rng(1).integers(0, api.action_boundary, size=(20, len(uids), 3)).tolist()
+    for turn in actions[:10]:
+        for uid, player_actions in zip(uids, turn):
+            for action in player_actions:
+                api.do_action(uid, action)
+
+    # The first player ended their turn and the second queued one action when the game is forked
+    turn = actions[10]
+    for action in turn[0]:
+        api.do_action(uids[0], action)
+    api.do_action(uids[1], turn[1][0])
+    forks = [game.fork(), engine()]
+    forks[1].restore(GameSnapshot.from_bytes(game.snapshot().to_bytes()))
+    assert all(state(other) == state(game) for other in forks)
+
+    fork_apis = [GameAPI.BotAPI(other, database="Null") for other in forks]
+    for each_api in [api] + fork_apis:
+        for action in turn[1][1:]:
+            each_api.do_action(uids[1], action)
+        for uid, player_actions in zip(uids[2:], turn[2:]):
+            for action in player_actions:
+                each_api.do_action(uid, action)
+        for turn_actions in actions[11:]:
+            for uid, player_actions in zip(uids, turn_actions):
+                for action in player_actions:
+                    each_api.do_action(uid, action)
+
+    assert game.day == 21
+    assert all(state(other) == state(game) for other in forks)